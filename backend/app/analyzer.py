@@ -0,0 +1,450 @@
+import ast
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+LOOP_NODES = (ast.For, ast.AsyncFor, ast.While)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+TRY_NODES = (ast.Try, ast.TryStar) if hasattr(ast, "TryStar") else (ast.Try,)
+
+# A new top-level chunk starts at an unindented def/class/decorator line.
+CHUNK_START = re.compile(r"^(?:@|def\s|async\s+def\s|class\s)")
+
+# CPython 3.11 keeps the AST converter's recursion depth per interpreter, not
+# per thread, so concurrent ast.parse calls from to_thread can fail with
+# "SystemError: AST constructor recursion depth mismatch". Parsing holds the
+# GIL anyway, so serializing it costs nothing.
+_PARSE_LOCK = threading.Lock()
+
+
+class _Unparseable(Exception):
+    """ast.parse gave up on the input for a reason other than a syntax error."""
+
+
+def _parse(text: str) -> ast.Module:
+    with _PARSE_LOCK:
+        try:
+            return ast.parse(text)
+        except (RecursionError, MemoryError):
+            # Very long operator chains or deep nesting exhaust the parser.
+            raise _Unparseable(
+                "Code is too complex to analyze; split very long or deeply nested expressions into smaller steps."
+            ) from None
+        except ValueError as e:  # e.g. null bytes in the source
+            raise _Unparseable(f"Code could not be analyzed: {e}.") from None
+
+
+def _is_list_value(node) -> bool:
+    return isinstance(node, (ast.List, ast.ListComp)) or (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "list"
+    )
+
+
+def _is_str_value(node) -> bool:
+    return (isinstance(node, ast.Constant) and isinstance(node.value, str)) or isinstance(node, ast.JoinedStr) or (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "str"
+    )
+
+
+def _assigned_names(node: ast.Assign):
+    return [t.id for t in node.targets if isinstance(t, ast.Name)]
+
+
+class WalkContext:
+    """State shared by the rules during one tree walk."""
+
+    def __init__(self, module_lists=frozenset()):
+        self.loops = []          # enclosing loop / comprehension nodes, outermost first
+        self.in_try = 0          # > 0 while inside a try body
+        self.scopes = [{}]       # per-function facts rules want to remember
+        self.module_lists = module_lists
+
+    @property
+    def scope(self) -> dict:
+        return self.scopes[-1]
+
+
+# =========================
+# Rules
+# =========================
+class Rule:
+    """
+    Base class for analyzer rules.
+
+    A rule lists the AST node types it cares about in `nodes`; the walker
+    calls check() for each of them with the live WalkContext, and finish()
+    once the walk is done. Both return (line, message) pairs. A fresh rule
+    instance is used for every walk, so rules may keep state on self.
+    """
+
+    name = ""
+    nodes = ()
+
+    def check(self, node, ctx: WalkContext):
+        return ()
+
+    def finish(self, ctx: WalkContext):
+        return ()
+
+
+class NestedLoops(Rule):
+    name = "nested-loops"
+    nodes = LOOP_NODES + (ast.comprehension,)
+
+    def __init__(self):
+        self._deepest = {}
+
+    def check(self, node, ctx):
+        if ctx.loops:
+            outer = ctx.loops[0]
+            depth = len(ctx.loops) + 1
+            line, best = self._deepest.get(id(outer), (outer.lineno, 1))
+            self._deepest[id(outer)] = (line, max(best, depth))
+        return ()
+
+    def finish(self, ctx):
+        for line, depth in self._deepest.values():
+            yield line, (
+                f"Loops nested {depth} deep make this roughly O(n^{depth}); "
+                "a dict/set lookup or sorting can often remove a level."
+            )
+
+
+class QuadraticMembership(Rule):
+    name = "quadratic-membership"
+    nodes = (ast.Assign, ast.Compare)
+
+    def check(self, node, ctx):
+        lists = ctx.scope.setdefault("lists", set())
+        assigned = ctx.scope.setdefault("assigned", set())
+        if isinstance(node, ast.Assign):
+            for name in _assigned_names(node):
+                assigned.add(name)
+                if _is_list_value(node.value):
+                    lists.add(name)
+                else:
+                    lists.discard(name)
+            return
+        if not ctx.loops:
+            return
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, ast.Name) and (
+                right.id in lists or (right.id in ctx.module_lists and right.id not in assigned)
+            ):
+                yield node.lineno, (
+                    f"`in {right.id}` scans the whole list on every loop iteration; "
+                    f"make {right.id} a set for O(1) lookups."
+                )
+
+
+class StringConcatInLoop(Rule):
+    name = "string-concat-in-loop"
+    nodes = (ast.Assign, ast.AugAssign)
+
+    def check(self, node, ctx):
+        strings = ctx.scope.setdefault("strings", set())
+        if isinstance(node, ast.Assign):
+            for name in _assigned_names(node):
+                if _is_str_value(node.value):
+                    strings.add(name)
+                else:
+                    strings.discard(name)
+            return
+        target = node.target
+        if ctx.loops and isinstance(node.op, ast.Add) and isinstance(target, ast.Name) and (
+            target.id in strings or _is_str_value(node.value)
+        ):
+            yield node.lineno, (
+                f"Building `{target.id}` with += inside a loop copies the string each time; "
+                "collect the parts in a list and ''.join() them."
+            )
+
+
+class AppendInLoop(Rule):
+    name = "append-in-loop"
+    nodes = (ast.For,)
+
+    @staticmethod
+    def _append_target(stmt):
+        if (
+            isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)
+            and isinstance(stmt.value.func, ast.Attribute) and stmt.value.func.attr == "append"
+            and isinstance(stmt.value.func.value, ast.Name) and len(stmt.value.args) == 1
+        ):
+            return stmt.value.func.value.id
+        return None
+
+    def check(self, node, ctx):
+        if node.orelse or len(node.body) != 1:
+            return
+        stmt, test = node.body[0], None
+        if isinstance(stmt, ast.If) and not stmt.orelse and len(stmt.body) == 1:
+            stmt, test = stmt.body[0], stmt.test
+        name = self._append_target(stmt)
+        if not name:
+            return
+        # A loop that reads the list it builds (`if x not in seen: seen.append(x)`)
+        # can't be written as a comprehension.
+        for part in (test, stmt.value.args[0]):
+            if part is not None and any(isinstance(n, ast.Name) and n.id == name for n in ast.walk(part)):
+                return
+        yield node.lineno, f"This loop only appends to `{name}`; a list comprehension is shorter and faster."
+
+
+class MissingInputValidation(Rule):
+    name = "missing-input-validation"
+    nodes = (ast.Call,)
+
+    def check(self, node, ctx):
+        if isinstance(node.func, ast.Name) and node.func.id == "input" and not ctx.in_try:
+            yield node.lineno, "input() is used outside try/except; validate or convert it in a try block to avoid runtime errors."
+
+
+RULES = [NestedLoops, QuadraticMembership, StringConcatInLoop, AppendInLoop, MissingInputValidation]
+
+
+# =========================
+# Walker
+# =========================
+def _walk(node, ctx: WalkContext, handlers: dict, issues: list):
+    for rule in handlers.get(type(node), ()):
+        for line, message in rule.check(node, ctx) or ():
+            issues.append((rule.name, line, message))
+
+    if isinstance(node, LOOP_NODES):
+        for field in ("target", "iter", "test"):
+            child = getattr(node, field, None)
+            if child is not None:
+                _walk(child, ctx, handlers, issues)
+        ctx.loops.append(node)
+        for child in node.body:
+            _walk(child, ctx, handlers, issues)
+        ctx.loops.pop()
+        for child in node.orelse:
+            _walk(child, ctx, handlers, issues)
+
+    elif isinstance(node, TRY_NODES):
+        ctx.in_try += 1
+        for child in node.body:
+            _walk(child, ctx, handlers, issues)
+        ctx.in_try -= 1
+        for child in node.handlers + node.orelse + node.finalbody:
+            _walk(child, ctx, handlers, issues)
+
+    elif isinstance(node, FUNCTIONS):
+        for child in getattr(node, "decorator_list", []) + [node.args]:
+            _walk(child, ctx, handlers, issues)
+        # A function body runs when called, not once per enclosing iteration.
+        saved = ctx.loops, ctx.in_try
+        ctx.loops, ctx.in_try = [], 0
+        ctx.scopes.append({})
+        for child in (node.body if isinstance(node.body, list) else [node.body]):
+            _walk(child, ctx, handlers, issues)
+        ctx.scopes.pop()
+        ctx.loops, ctx.in_try = saved
+
+    elif isinstance(node, COMPREHENSIONS):
+        pushed = 0
+        for generator in node.generators:
+            _walk(generator.iter, ctx, handlers, issues)
+            for rule in handlers.get(ast.comprehension, ()):
+                for line, message in rule.check(node, ctx) or ():
+                    issues.append((rule.name, line, message))
+            ctx.loops.append(node)
+            pushed += 1
+            _walk(generator.target, ctx, handlers, issues)
+            for condition in generator.ifs:
+                _walk(condition, ctx, handlers, issues)
+        for field in ("elt", "key", "value"):
+            child = getattr(node, field, None)
+            if child is not None:
+                _walk(child, ctx, handlers, issues)
+        del ctx.loops[len(ctx.loops) - pushed:]
+
+    else:
+        for child in ast.iter_child_nodes(node):
+            _walk(child, ctx, handlers, issues)
+
+
+def _module_lists(tree: ast.Module) -> set:
+    names = set()
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Assign) and _is_list_value(stmt.value):
+            names.update(_assigned_names(stmt))
+    return names
+
+
+def _split_chunks(code: str) -> list:
+    """Split source into (first_line, text) chunks at top-level def/class/decorator lines."""
+    lines = code.splitlines(keepends=True)
+    chunks, start, previous = [], 0, ""
+    for i, line in enumerate(lines):
+        if i and CHUNK_START.match(line) and not previous.startswith("@"):
+            chunks.append((start + 1, "".join(lines[start:i])))
+            start = i
+        if line.strip() and not line.lstrip().startswith("#"):
+            previous = line
+    chunks.append((start + 1, "".join(lines[start:])))
+    return chunks
+
+
+class _LRU:
+    def __init__(self, size: int):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+
+# =========================
+# Analyzer
+# =========================
+class CodeAnalyzer:
+    """
+    AST-based static analysis for /suggest.
+
+    Source is split into top-level chunks (each def/class with the code that
+    follows it) that are parsed and checked independently, so an edit to a
+    few lines only re-analyzes the chunk it touches. Whole results are cached
+    by code hash, chunk results by chunk hash. If the chunk split doesn't
+    parse (e.g. "def" at column 0 inside a string) the whole file is analyzed
+    in one piece instead.
+    """
+
+    def __init__(self, rules=None, cache_size: int = 256, chunk_cache_size: int = 4096):
+        self.rules = list(rules or RULES)
+        self._results = _LRU(cache_size)
+        self._chunks = _LRU(chunk_cache_size)
+        self.hits = 0
+        self.misses = 0
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def cached(self, code: str):
+        result = self._results.get(self._hash(code))
+        if result is not None:
+            self.hits += 1
+        return result
+
+    def _check_tree(self, tree, module_lists) -> list:
+        rules = [rule() for rule in self.rules]
+        handlers = {}
+        for rule in rules:
+            for node_type in rule.nodes:
+                handlers.setdefault(node_type, []).append(rule)
+        ctx = WalkContext(frozenset(module_lists))
+        issues = []
+        try:
+            _walk(tree, ctx, handlers, issues)
+        except RecursionError:
+            # Pathologically deep expressions: skip the hints rather than fail.
+            return []
+        for rule in rules:
+            issues.extend((rule.name, line, message) for line, message in rule.finish(ctx))
+        return issues
+
+    def _chunk_entry(self, text: str) -> dict:
+        key = self._hash(text)
+        entry = self._chunks.get(key)
+        if entry is None:
+            self.chunk_misses += 1
+            tree = _parse(text)
+            entry = {"text": text, "tree": tree, "lists": _module_lists(tree), "issues": {}}
+            self._chunks.set(key, entry)
+        else:
+            self.chunk_hits += 1
+        return entry
+
+    def _chunk_issues(self, entry: dict, module_lists: frozenset) -> list:
+        issues = entry["issues"].get(module_lists)
+        if issues is None:
+            tree = entry["tree"] or _parse(entry["text"])
+            issues = entry["issues"][module_lists] = self._check_tree(tree, module_lists)
+            # Cached chunks keep only their source and results, not the AST.
+            entry["tree"] = None
+        return issues
+
+    def analyze(self, code: str) -> dict:
+        key = self._hash(code)
+        result = self._results.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        try:
+            result = self._analyze(code)
+        except _Unparseable as e:
+            result = _unparseable_result(str(e))
+        self._results.set(key, result)
+        return result
+
+    def _analyze(self, code: str) -> dict:
+        try:
+            chunks = [(first, self._chunk_entry(text)) for first, text in _split_chunks(code)]
+        except SyntaxError:
+            chunks = None
+        if chunks is None:
+            try:
+                chunks = [(1, self._chunk_entry(code))]
+            except SyntaxError as e:
+                return _syntax_error_result(e)
+
+        module_lists = frozenset().union(*(entry["lists"] for _, entry in chunks))
+        issues = []
+        for first, entry in chunks:
+            for rule, line, message in self._chunk_issues(entry, module_lists):
+                issues.append({"rule": rule, "line": line + first - 1, "message": message})
+        issues.sort(key=lambda issue: (issue["line"], issue["rule"]))
+
+        return {"suggestions": _summarize(issues), "issues": issues}
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "chunk_hits": self.chunk_hits,
+            "chunk_misses": self.chunk_misses,
+            "rules": [rule.name for rule in self.rules],
+        }
+
+
+def _summarize(issues: list) -> list:
+    """One human-readable suggestion per distinct message, listing its lines."""
+    lines = OrderedDict()
+    for issue in issues:
+        lines.setdefault(issue["message"], []).append(issue["line"])
+    suggestions = []
+    for message, at in lines.items():
+        label = "Line" if len(at) == 1 else "Lines"
+        suggestions.append(f"{label} {', '.join(map(str, at))}: {message}")
+    return suggestions
+
+
+def _syntax_error_result(e: SyntaxError) -> dict:
+    message = f"Syntax error: {e.msg}"
+    issue = {"rule": "syntax", "line": e.lineno or 1, "message": message}
+    return {"suggestions": [f"Line {issue['line']}: {message}"], "issues": [issue]}
+
+
+def _unparseable_result(message: str) -> dict:
+    issue = {"rule": "too-complex", "line": 1, "message": message}
+    return {"suggestions": [f"Line 1: {message}"], "issues": [issue]}
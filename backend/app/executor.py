@@ -0,0 +1,502 @@
+import asyncio
+import builtins
+import io
+import marshal
+import multiprocessing
+import os
+import pickle
+import select
+import signal
+import sys
+import time
+import traceback
+from dataclasses import dataclass, replace
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock limit applies
+    resource = None
+
+from app import metrics
+from app.piston_client import execute_code as piston_execute
+
+
+@dataclass(frozen=True)
+class ExecutionLimits:
+    cpu_seconds: float = 2.0
+    wall_seconds: float = 5.0
+    memory_bytes: int = 256 * 1024 * 1024
+    output_bytes: int = 64 * 1024
+
+
+def _observe(backend: str, result: dict) -> dict:
+    metrics.EXEC_RUN.labels(backend, result["status"]).observe(result["time"])
+    metrics.EXEC_QUEUE_WAIT.labels(backend).observe(result["queue_wait"])
+    metrics.add_timing("exec-queue", result["queue_wait"])
+    metrics.add_timing("exec", result["time"])
+    return result
+
+
+class ExecutorBusy(Exception):
+    """Raised when the job queue is full and the caller should retry later."""
+
+
+def _failure(status: str, error: str, elapsed: float) -> dict:
+    return {
+        "output": "",
+        "error": error,
+        "status": status,
+        "time": round(elapsed, 6),
+        "cpu_time": None,
+        "memory_kb": None,
+    }
+
+
+# =========================
+# Worker process side
+# =========================
+# Both derive from BaseException so a student's `except Exception:` can't
+# swallow them and keep running past the limit.
+class _OutputLimitExceeded(BaseException):
+    pass
+
+
+class _CpuLimitExceeded(BaseException):
+    pass
+
+
+class _BoundedWriter(io.TextIOBase):
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._size = 0
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        room = self._limit - self._size
+        if len(s) > room:
+            self._parts.append(s[:max(room, 0)])
+            self._size = self._limit
+            raise _OutputLimitExceeded()
+        self._parts.append(s)
+        self._size += len(s)
+        return len(s)
+
+    def getvalue(self) -> str:
+        return "".join(self._parts)
+
+
+def _on_sigxcpu(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _apply_limits(limits: ExecutionLimits, defaults: dict):
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # RLIMIT_CPU counts the process's lifetime CPU, so the budget is relative.
+    cpu_soft = int(usage.ru_utime + usage.ru_stime + limits.cpu_seconds) + 1
+    for name, soft in ((resource.RLIMIT_CPU, cpu_soft), (resource.RLIMIT_AS, limits.memory_bytes)):
+        hard = defaults[name][1]
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(name, (soft, hard))
+
+
+def _restore_limits(defaults: dict):
+    if resource is None:
+        return
+    for name, value in defaults.items():
+        resource.setrlimit(name, value)
+
+
+# memory_kb is the job's own peak RSS, read from VmHWM after resetting it.
+# That needs Linux's /proc; elsewhere memory_kb is None. (ru_maxrss is no
+# substitute: it is the process's lifetime peak, inherited from the parent
+# across spawn, and in bytes rather than KB on macOS.)
+def _reset_peak_rss() -> bool:
+    """Reset the process's VmHWM so it measures just the next job."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _job_peak_rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return None
+
+
+def _run_job(source, stdin: str, limits: ExecutionLimits, defaults: dict) -> dict:
+    measured = _reset_peak_rss()
+    stdout = _BoundedWriter(limits.output_bytes)
+    stderr = _BoundedWriter(limits.output_bytes)
+    status, error = "ok", ""
+    saved = sys.stdin, sys.stdout, sys.stderr
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        sys.stdin, sys.stdout, sys.stderr = io.StringIO(stdin), stdout, stderr
+        _apply_limits(limits, defaults)
+        if isinstance(source, bytes):
+            code = marshal.loads(source)
+        else:
+            code = compile(source, "<main>", "exec")
+        exec(code, {"__name__": "__main__", "__builtins__": builtins})
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status, error = "error", f"Exited with code {e.code}"
+    except _OutputLimitExceeded:
+        status, error = "output_limit", "Output limit exceeded"
+    except _CpuLimitExceeded:
+        status, error = "timeout", "CPU time limit exceeded"
+    except MemoryError:
+        status, error = "memory", "Memory limit exceeded"
+    except BaseException as e:
+        status = "error"
+        error = "Execution Error: " + "".join(traceback.format_exception_only(type(e), e)).strip()
+    finally:
+        _restore_limits(defaults)
+        sys.stdin, sys.stdout, sys.stderr = saved
+
+    stderr_text = stderr.getvalue()
+    return {
+        "output": stdout.getvalue(),
+        "error": "\n".join(part for part in (stderr_text.rstrip("\n"), error) if part),
+        "status": status,
+        "time": round(time.perf_counter() - start, 6),
+        "cpu_time": round(time.process_time() - cpu_start, 6),
+        "memory_kb": _job_peak_rss_kb() if measured else None,
+    }
+
+
+# Where fork exists, each job runs in a fork of its (otherwise idle) worker, so
+# whatever it changes (builtins, imported modules, sys settings, threads) dies
+# with it. Elsewhere the job runs in the worker, which is replaced after it.
+FORK_PER_JOB = hasattr(os, "fork")
+
+
+def _run_forked(source, stdin: str, limits: ExecutionLimits, defaults: dict) -> dict:
+    start = time.perf_counter()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            with os.fdopen(write_fd, "wb") as pipe:
+                pipe.write(pickle.dumps(_run_job(source, stdin, limits, defaults)))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    deadline = start + limits.wall_seconds
+    with os.fdopen(read_fd, "rb", buffering=0) as pipe:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not select.select([pipe], [], [], remaining)[0]:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return _failure("timeout", "Time limit exceeded", time.perf_counter() - start)
+            chunk = pipe.read(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    os.waitpid(pid, 0)
+    try:
+        return pickle.loads(b"".join(chunks))
+    except (pickle.UnpicklingError, EOFError):
+        # Killed by the kernel, os._exit() or crashed the interpreter.
+        return _failure("crashed", "Execution crashed", time.perf_counter() - start)
+
+
+def _worker_main(conn):
+    # Student code talks to per-job streams; anything written straight to the
+    # inherited fds (os.write, C extensions) goes nowhere instead of the
+    # server's terminal.
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    defaults = {}
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+        defaults = {
+            name: resource.getrlimit(name) for name in (resource.RLIMIT_CPU, resource.RLIMIT_AS)
+        }
+
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        conn.send((_run_forked if FORK_PER_JOB else _run_job)(*job, defaults))
+
+
+# =========================
+# Server side
+# =========================
+
+class _Worker:
+    """Handle on one pre-forked worker process. call() blocks; run it off the loop."""
+
+    BOOT_TIMEOUT = 30.0
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.jobs = 0
+
+    def call(self, job: tuple, timeout: float) -> dict:
+        if not self.ready:
+            if not self.conn.poll(self.BOOT_TIMEOUT):
+                raise EOFError("worker did not start")
+            self.conn.recv()
+            self.ready = True
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise TimeoutError()
+        return self.conn.recv()
+
+    def stop(self, force: bool = False):
+        if not force and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+
+class ProcessPoolEngine:
+    """
+    Runs Python submissions on a pool of pre-forked worker processes.
+
+    Each job runs in a fresh fork of a pre-started worker, so nothing one
+    submission changes in the interpreter can affect the next, and is bounded
+    by CPU time and address space (rlimits), wall time (the job is killed)
+    and output size. Without fork (Windows) the job runs in the worker itself,
+    which is replaced after every job. Workers are also recycled after
+    max_jobs_per_worker jobs.
+    Jobs wait in a bounded queue; when it is full run() raises ExecutorBusy
+    instead of letting latency grow without limit.
+
+    This isolates resource usage and crashes from the server process. It is
+    not a security boundary against hostile code; use the Piston backend for
+    that.
+    """
+
+    WALL_GRACE = 1.0
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_jobs_per_worker: int = 100,
+        queue_size: int = 32,
+        limits: ExecutionLimits = None,
+        start_method: str = "spawn",
+    ):
+        self.size = workers
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.queue_size = queue_size
+        self.limits = limits or ExecutionLimits()
+        self._ctx = multiprocessing.get_context(start_method)
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._dispatchers = []
+        self.completed = 0
+        self.rejected = 0
+        self.recycled = 0
+        self.killed = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._dispatchers)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.started and self._loop is loop:
+            return
+        # Dispatchers from a previous event loop (e.g. a TestClient used
+        # without its context manager) are dead; replace the whole pool.
+        for worker in self._workers:
+            worker.stop(force=True)
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [_Worker(self._ctx) for _ in range(self.size)]
+        self._dispatchers = [
+            asyncio.ensure_future(self._dispatch(i)) for i in range(self.size)
+        ]
+
+    async def aclose(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        for worker in self._workers:
+            await asyncio.to_thread(worker.stop)
+        self._workers = []
+        self._loop = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def prepare(self, source: str) -> bytes:
+        """
+        Compile source once for repeated runs. Raises SyntaxError.
+
+        Workers run the same interpreter as the server, so the marshalled
+        code object can be shipped to them instead of recompiling per job.
+        """
+        return marshal.dumps(compile(source, "<main>", "exec"))
+
+    async def run(self, source, stdin: str = "", limits: ExecutionLimits = None, wait: bool = False) -> dict:
+        """
+        Run source (text, or bytes from prepare()) with the given stdin.
+
+        With wait=False a full queue raises ExecutorBusy; with wait=True the
+        caller waits for a free slot instead.
+        """
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        job = (source, stdin, limits or self.limits, future, time.perf_counter())
+        if wait:
+            await self._queue.put(job)
+        else:
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self.rejected += 1
+                raise ExecutorBusy("Execution queue is full")
+        return _observe("local", await future)
+
+    async def _dispatch(self, index: int):
+        while True:
+            source, stdin, limits, future, enqueued = await self._queue.get()
+            if future.cancelled():
+                continue
+            started = time.perf_counter()
+            worker = self._workers[index]
+            retire = force = False
+            # A forked job enforces its own wall time; this is the backstop
+            # for a worker that stops answering.
+            timeout = limits.wall_seconds + (self.WALL_GRACE if FORK_PER_JOB else 0.0)
+            try:
+                result = await asyncio.to_thread(worker.call, (source, stdin, limits), timeout)
+                worker.jobs += 1
+                retire = not FORK_PER_JOB or worker.jobs >= self.max_jobs_per_worker
+                self.recycled += retire
+            except TimeoutError:
+                self.killed += 1
+                retire = force = True
+                result = _failure("timeout", "Time limit exceeded", time.perf_counter() - started)
+            except (EOFError, OSError):
+                # Killed by the kernel (e.g. memory) or crashed the interpreter.
+                self.killed += 1
+                retire = force = True
+                result = _failure("crashed", "Execution crashed", time.perf_counter() - started)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+
+            self.completed += 1
+            result["queue_wait"] = round(started - enqueued, 6)
+            if not future.done():
+                future.set_result(result)
+            if retire:
+                await self._replace(index, force)
+
+    async def _replace(self, index: int, force: bool = False):
+        old = self._workers[index]
+        # Start the replacement first so it boots while the old one shuts down.
+        self._workers[index] = _Worker(self._ctx)
+        await asyncio.to_thread(old.stop, force)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "local",
+            "workers": self.size,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "recycled": self.recycled,
+            "killed": self.killed,
+        }
+
+
+class PistonBackend:
+    """Remote execution through the public Piston API, same interface as ProcessPoolEngine."""
+
+    def __init__(self, language: str = "python", concurrency: int = 4):
+        self.language = language
+        self.size = concurrency
+        self.completed = 0
+
+    async def start(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    def prepare(self, source: str) -> str:
+        # Piston compiles remotely; syntax errors come back per run.
+        return source
+
+    async def run(self, source: str, stdin: str = "", limits: ExecutionLimits = None, wait: bool = False) -> dict:
+        start = time.perf_counter()
+        result = await piston_execute(self.language, source, stdin)
+        self.completed += 1
+        error = result.get("error", "")
+        return _observe("piston", {
+            "output": result.get("output", ""),
+            "error": error,
+            "status": "error" if error else "ok",
+            "time": round(time.perf_counter() - start, 6),
+            "cpu_time": None,
+            "memory_kb": None,
+            "queue_wait": 0.0,
+        })
+
+    def stats(self) -> dict:
+        return {"backend": "piston", "completed": self.completed}
+
+
+def create_engine(backend: str = "local", **kwargs):
+    if backend == "piston":
+        return PistonBackend()
+    if backend == "local":
+        return ProcessPoolEngine(**kwargs)
+    raise ValueError(f"Unknown execution backend: {backend}")
+
+
+def limits_from_env() -> ExecutionLimits:
+    defaults = ExecutionLimits()
+    return replace(
+        defaults,
+        cpu_seconds=float(os.getenv("EXEC_CPU_SECONDS", defaults.cpu_seconds)),
+        wall_seconds=float(os.getenv("EXEC_WALL_SECONDS", defaults.wall_seconds)),
+        memory_bytes=int(os.getenv("EXEC_MEMORY_MB", defaults.memory_bytes // (1024 * 1024))) * 1024 * 1024,
+        output_bytes=int(os.getenv("EXEC_OUTPUT_KB", defaults.output_bytes // 1024)) * 1024,
+    )
@@ -0,0 +1,55 @@
+import asyncio
+
+
+def _normalize(text: str) -> str:
+    # Judges conventionally ignore trailing spaces and trailing blank lines.
+    return "\n".join(line.rstrip() for line in text.rstrip().splitlines())
+
+
+def verdict_for(result: dict, expected) -> str:
+    """Map an execution result to pass / fail / timeout / error."""
+    if result["status"] == "timeout":
+        return "timeout"
+    if result["status"] != "ok" or (result["error"] and not result["output"]):
+        return "error"
+    if expected is None or _normalize(result["output"]) == _normalize(expected):
+        return "pass"
+    return "fail"
+
+
+async def judge_batch(engine, source: str, cases: list, stop_on_failure: bool = False, limits=None):
+    """
+    Run one program against many test cases, yielding a verdict per case as
+    soon as it finishes (completion order, tagged with its index).
+
+    The source is compiled once via engine.prepare() and the cases are
+    spread across the engine's workers. With stop_on_failure, the first
+    non-passing verdict cancels every case that hasn't started yet.
+    Raises SyntaxError before any case runs if the source doesn't compile.
+    """
+    code = engine.prepare(source)
+    slots = asyncio.Semaphore(max(1, engine.size))
+
+    async def run_case(index: int, case: dict):
+        async with slots:
+            result = await engine.run(code, case.get("stdin", ""), limits, wait=True)
+        return {
+            "index": index,
+            "verdict": verdict_for(result, case.get("expected")),
+            "time": result["time"],
+            "memory_kb": result["memory_kb"],
+            "output": result["output"],
+            "error": result["error"],
+        }
+
+    tasks = [asyncio.ensure_future(run_case(i, case)) for i, case in enumerate(cases)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            case = await next_done
+            yield case
+            if stop_on_failure and case["verdict"] != "pass":
+                return
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,412 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE,
+    score INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_users_score ON users (score DESC, id);
+"""
+
+# Totals are clamped to this range. SQLite silently turns an overflowing
+# INTEGER sum into a REAL.
+SCORE_LIMIT = 2 ** 62
+
+
+def _rank_rows(rows, offset: int, first_rank: int) -> list:
+    """
+    Attach competition ranks (equal scores share a rank) to (name, score)
+    rows sorted by score, given the rank of the first row.
+    """
+    page = []
+    for i, (name, score) in enumerate(rows):
+        if i == 0:
+            rank = first_rank
+        elif score != rows[i - 1][1]:
+            rank = offset + i + 1
+        page.append({"rank": rank, "name": name, "score": score})
+    return page
+
+
+class TopSnapshot:
+    """
+    In-memory copy of the top `size` users, kept current from the write path.
+
+    apply() folds in committed scores and only invalidates the serialized
+    pages when the top N actually changes. Pages are JSON-encoded once per
+    version and tagged with a content hash, so every poller gets the same
+    bytes and ETag (across uvicorn workers too) until the ranking moves.
+    """
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self.version = 0
+        self.loaded = False
+        self._rows = []  # [score, id, name], best first
+        self._pages = {}
+
+    def load(self, rows):
+        """Replace the snapshot with (name, score, id) rows from the database."""
+        self._rows = [[score, user_id, name] for name, score, user_id in rows]
+        self.loaded = True
+        self._changed()
+
+    def apply(self, updates: dict) -> bool:
+        """
+        Fold in {name: (score, id)} from a committed batch. Returns False when
+        the snapshot can't be updated in place and must be reloaded.
+        """
+        index = {row[2]: row for row in self._rows}
+        full = len(self._rows) >= self.size
+        # The pre-batch Nth row. Rows only move up in place here, so anyone
+        # who doesn't beat it can't make the new top N; later entrants must
+        # not be compared with rows appended earlier in this loop.
+        cutoff = (-self._rows[-1][0], self._rows[-1][1]) if full else None
+        changed = False
+        for name, (score, user_id) in updates.items():
+            row = index.get(name)
+            if row is not None:
+                if row[0] == score:
+                    continue
+                if score < row[0] and full:
+                    # Someone outside the snapshot may now belong in it.
+                    return False
+                row[0] = score
+                changed = True
+            elif not full or (-score, user_id) < cutoff:
+                row = [score, user_id, name]
+                self._rows.append(row)
+                index[name] = row
+                changed = True
+        if changed:
+            self._rows.sort(key=lambda r: (-r[0], r[1]))
+            del self._rows[self.size:]
+            self._changed()
+        return True
+
+    def _changed(self):
+        self.version += 1
+        self._pages = {}
+
+    def page(self, limit: int):
+        """Serialized top-`limit` page and its ETag."""
+        cached = self._pages.get(limit)
+        if cached is None:
+            rows = [(name, score) for score, _, name in self._rows[:limit]]
+            body = json.dumps(_rank_rows(rows, 0, 1), separators=(",", ":")).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+            cached = self._pages[limit] = (body, etag)
+        return cached
+
+
+class LeaderboardStore:
+    """
+    File-backed leaderboard shared by every uvicorn worker.
+
+    SQLite runs in WAL mode so readers never wait on the writer. Reads go to
+    a small pool of threads, each with its own connection; all writes go
+    through one dedicated writer thread. Score updates are buffered and
+    folded per user, then committed as one transaction every flush_interval
+    seconds (or sooner once batch_size users are pending). add_score()
+    resolves when its batch is durable.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        readers: int = 4,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        seed_users=(("user", 0),),
+        snapshot_size: int = 100,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._readers = readers
+        self._seed_users = seed_users
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._read_pool = None
+        self._write_pool = None
+        self._loop = None
+        self._pending = {}
+        self._waiters = []
+        self._flush_now = None
+        self._flusher = None
+        self._data_version = None
+        self.snapshot = TopSnapshot(snapshot_size)
+        self.batches = 0
+        self.writes = 0
+        self.snapshot_reloads = 0
+
+    # -------------------------
+    # Connections
+    # -------------------------
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            # Keep the hot score/name index pages in memory for large tables.
+            db.execute("PRAGMA cache_size=-32000")
+            db.execute("PRAGMA mmap_size=268435456")
+            self._local.db = db
+            with self._connections_lock:
+                self._connections.append(db)
+        return db
+
+    def _init_schema(self):
+        db = self._conn()
+        db.executescript(SCHEMA)
+        db.executemany(
+            "INSERT OR IGNORE INTO users (name, score) VALUES (?, ?)", self._seed_users
+        )
+        db.commit()
+
+    @staticmethod
+    def _timed(timing, fn, *args):
+        # Runs on the pool thread, so only SQLite time is measured.
+        with metrics.timed(metrics.DB_QUERY.labels(fn.__name__.lstrip("_")), timing):
+            return fn(*args)
+
+    async def _read(self, fn, *args):
+        await self.start()
+        # Carry the request context over so the query shows up in Server-Timing.
+        ctx = contextvars.copy_context()
+        return await self._loop.run_in_executor(self._read_pool, ctx.run, self._timed, "db", fn, *args)
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    @property
+    def started(self) -> bool:
+        return self._flusher is not None and not self._flusher.done()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.started and self._loop is loop:
+            return
+        self._loop = loop
+        if self._write_pool is None:
+            self._read_pool = ThreadPoolExecutor(self._readers, thread_name_prefix="leaderboard-read")
+            self._write_pool = ThreadPoolExecutor(1, thread_name_prefix="leaderboard-write")
+            await loop.run_in_executor(self._write_pool, self._init_schema)
+            await self._sync_snapshot(force=True)
+        self._flush_now = asyncio.Event()
+        self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def aclose(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            await self._flush()
+        for pool in (self._read_pool, self._write_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._read_pool = self._write_pool = None
+        with self._connections_lock:
+            for db in self._connections:
+                db.close()
+            self._connections = []
+        # Connections were thread-local to the pools that just shut down.
+        self._local = threading.local()
+        self._loop = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    # -------------------------
+    # Batched writes
+    # -------------------------
+    async def add_score(self, name: str, points: int) -> int:
+        """Add points to name (creating the user) and return the new score once committed."""
+        await self.start()
+        self._pending[name] = self._pending.get(name, 0) + points
+        future = self._loop.create_future()
+        self._waiters.append((name, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush_now.set()
+        return await future
+
+    def _apply_batch(self, updates: dict) -> dict:
+        db = self._conn()
+        with db:
+            db.executemany(
+                """
+                INSERT INTO users (name, score) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET score = MAX(MIN(score + excluded.score, ?), ?)
+                """,
+                [(name, points, SCORE_LIMIT, -SCORE_LIMIT) for name, points in updates.items()],
+            )
+            scores = {}
+            names = list(updates)
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                rows = db.execute(
+                    f"SELECT name, score, id FROM users WHERE name IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                scores.update((name, (score, user_id)) for name, score, user_id in rows)
+        return scores
+
+    def _apply_each(self, updates: dict):
+        """Fallback when a batch fails: apply users one by one so a bad row only fails its own callers."""
+        scores, errors = {}, {}
+        for name, points in updates.items():
+            try:
+                scores.update(self._apply_batch({name: points}))
+            except Exception as e:
+                errors[name] = e
+        return scores, errors
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        updates, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, []
+        try:
+            try:
+                scores = await self._loop.run_in_executor(
+                    self._write_pool, self._timed, None, self._apply_batch, updates
+                )
+                errors = {}
+            except Exception:
+                # e.g. points too large to bind: retry per user so the rest commit.
+                scores, errors = await self._loop.run_in_executor(
+                    self._write_pool, self._timed, None, self._apply_each, updates
+                )
+        except Exception as e:
+            # These callers are no longer in _pending; don't leave them waiting.
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        self.batches += 1
+        for name, future in waiters:
+            if future.done():
+                continue
+            if name in errors:
+                future.set_exception(errors[name])
+            else:
+                future.set_result(scores[name][0])
+                self.writes += 1
+        if scores and not self.snapshot.apply(scores):
+            await self._sync_snapshot(force=True)
+
+    def _snapshot_rows(self, force: bool):
+        db = self._conn()
+        # data_version only moves when another connection (e.g. another
+        # uvicorn worker) commits, so our own batches don't trigger reloads.
+        version = db.execute("PRAGMA data_version").fetchone()[0]
+        if not force and version == self._data_version:
+            return None
+        rows = db.execute(
+            "SELECT name, score, id FROM users ORDER BY score DESC, id LIMIT ?",
+            (self.snapshot.size,),
+        ).fetchall()
+        self._data_version = version
+        return rows
+
+    async def _sync_snapshot(self, force: bool = False):
+        rows = await self._loop.run_in_executor(self._write_pool, self._timed, None, self._snapshot_rows, force)
+        if rows is not None:
+            self.snapshot.load(rows)
+            self.snapshot_reloads += 1
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self._flush()
+                await self._sync_snapshot()
+            except Exception:
+                # e.g. "database is locked" while another worker writes. The
+                # batch's callers got the error; keep serving everyone else,
+                # and reload the snapshot next time in case it missed a change.
+                logger.exception("leaderboard_flush_failed")
+                self._data_version = None
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    # Ranks use competition ranking: users with equal scores share a rank,
+    # i.e. rank = 1 + number of users with a strictly higher score.
+    def _ahead_of(self, db, score: int) -> int:
+        return db.execute("SELECT COUNT(*) FROM users WHERE score > ?", (score,)).fetchone()[0]
+
+    def _top(self, limit: int, offset: int) -> list:
+        db = self._conn()
+        rows = db.execute(
+            "SELECT name, score FROM users ORDER BY score DESC, id LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        if not rows:
+            return []
+        first_rank = self._ahead_of(db, rows[0][1]) + 1 if offset else 1
+        return _rank_rows(rows, offset, first_rank)
+
+    def _rank(self, name: str):
+        db = self._conn()
+        row = db.execute("SELECT score FROM users WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return {"rank": self._ahead_of(db, row[0]) + 1, "name": name, "score": row[0]}
+
+    def _count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    async def top(self, limit: int = 10, offset: int = 0) -> list:
+        return await self._read(self._top, limit, offset)
+
+    async def top_page(self, limit: int = 10):
+        """
+        Pre-serialized (body, etag) for the top `limit` users, served from the
+        in-memory snapshot without touching the database. Returns None when
+        limit is larger than the snapshot.
+        """
+        if limit > self.snapshot.size:
+            return None
+        await self.start()
+        return self.snapshot.page(limit)
+
+    async def rank_of(self, name: str):
+        return await self._read(self._rank, name)
+
+    async def count(self) -> int:
+        return await self._read(self._count)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "snapshot_size": self.snapshot.size,
+            "snapshot_version": self.snapshot.version,
+            "snapshot_reloads": self.snapshot_reloads,
+        }
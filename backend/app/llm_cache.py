@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+def cache_key(prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+    """Content address for a completion: whitespace-normalized prompt plus sampling params."""
+    normalized = " ".join(prompt.split())
+    raw = json.dumps([normalized, model, max_tokens, temperature], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskTier:
+    """SQLite-backed second tier so cached answers survive restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = None
+        self._lock = asyncio.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """)
+            self._db.commit()
+        return self._db
+
+    def _get(self, key: str):
+        db = self._conn()
+        row = db.execute(
+            "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            db.commit()
+            return None
+        return row[0]
+
+    def _set(self, key: str, value: str, expires_at: float):
+        db = self._conn()
+        db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+        db.commit()
+
+    async def get(self, key: str):
+        async with self._lock:
+            return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str, expires_at: float):
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, value, expires_at)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class ResponseCache:
+    """
+    Two-tier cache in front of call_llm.
+
+    The memory tier is an LRU bounded by max_entries with a per-entry TTL.
+    The optional disk tier is consulted on a memory miss and promotes hits
+    back into memory. Concurrent lookups for the same key share a single
+    in-flight computation, so a burst of identical "two sum" prompts costs
+    one upstream call.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, disk_path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskTier(disk_path) if disk_path else None
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get_memory(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: str, value: str):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str):
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.disk is not None:
+            value = await self.disk.get(key)
+            if value is not None:
+                self.disk_hits += 1
+                self._set_memory(key, value)
+                return value
+        return None
+
+    async def set(self, key: str, value: str):
+        self._set_memory(key, value)
+        if self.disk is not None:
+            await self.disk.set(key, value, time.time() + self.ttl)
+
+    async def get_or_compute(self, key: str, compute):
+        """Return the cached value for key, or await compute() once and cache its result."""
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fill(key, compute))
+            self._inflight[key] = task
+        # Shielded so one caller disconnecting doesn't cancel the upstream
+        # call that other waiters are sharing.
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, compute):
+        try:
+            value = await compute()
+            await self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk": self.disk.path if self.disk else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.disk_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+import httpx
+
+from app import metrics
+
+
+class UpstreamError(Exception):
+    """Non-200 reply from the completions endpoint."""
+
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"OpenRouter Error {status_code}: {body}")
+        self.status_code = status_code
+        self.body = body
+
+
+class LLMClient:
+    """
+    Shared async HTTP client for OpenRouter chat completions.
+
+    One instance lives for the whole app: the underlying httpx.AsyncClient
+    keeps connections alive between requests, and a semaphore caps how many
+    upstream calls are in flight at once so a burst of students can't open
+    an unbounded number of sockets. All traffic goes to a single host, so the
+    pool limits are effectively per-host limits.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._transport = transport
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self):
+        if not self.started:
+            self._client = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self._timeout,
+                transport=self._transport,
+            )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def post(self, payload: dict, headers: dict) -> httpx.Response:
+        # Opened lazily so callers outside the app lifespan (scripts, tests
+        # without a TestClient context) still work.
+        await self.start()
+        model = payload.get("model", "")
+        queued = time.perf_counter()
+        async with self._semaphore:
+            start = time.perf_counter()
+            metrics.LLM_QUEUE_WAIT.labels(model).observe(start - queued)
+            metrics.add_timing("llm-queue", start - queued)
+            status = "error"
+            try:
+                # Sent as a stream so time-to-first-byte can be told apart
+                # from generation time; the body is read in full before returning.
+                request = self._client.build_request("POST", self.url, json=payload, headers=headers)
+                response = await self._client.send(request, stream=True)
+                status = response.status_code
+                self._observe_ttfb(model, "blocking", start)
+                try:
+                    await response.aread()
+                finally:
+                    await response.aclose()
+                if status == 200:
+                    tokens = (response.json().get("usage") or {}).get("completion_tokens")
+                    if tokens:
+                        metrics.LLM_TOKENS.labels(model).inc(tokens)
+                return response
+            finally:
+                self._observe_total(model, "blocking", status, start)
+
+    def _observe_ttfb(self, model: str, mode: str, start: float):
+        elapsed = time.perf_counter() - start
+        metrics.LLM_TTFB.labels(model, mode).observe(elapsed)
+        metrics.add_timing("llm-ttfb", elapsed)
+
+    def _observe_total(self, model: str, mode: str, status, start: float):
+        elapsed = time.perf_counter() - start
+        metrics.LLM_DURATION.labels(model, mode, status).observe(elapsed)
+        metrics.add_timing("llm", elapsed)
+
+    async def stream(self, payload: dict, headers: dict):
+        """
+        Yield content deltas from a `stream: true` completion.
+
+        The concurrency slot is held until the stream is exhausted or the
+        consumer closes the generator (e.g. the browser disconnects).
+        """
+        await self.start()
+        model = payload.get("model", "")
+        queued = time.perf_counter()
+        async with self._semaphore:
+            start = time.perf_counter()
+            metrics.LLM_QUEUE_WAIT.labels(model).observe(start - queued)
+            metrics.add_timing("llm-queue", start - queued)
+            status, tokens, usage = "error", 0, None
+            try:
+                async with self._client.stream(
+                    "POST", self.url, json={**payload, "stream": True}, headers=headers
+                ) as response:
+                    status = response.status_code
+                    self._observe_ttfb(model, "stream", start)
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        raise UpstreamError(response.status_code, body.decode(errors="replace"))
+                    async for line in response.aiter_lines():
+                        # OpenRouter interleaves ": keep-alive" comments with data lines.
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        usage = chunk.get("usage") or usage
+                        choices = chunk.get("choices") or [{}]
+                        delta = choices[0].get("delta", {}).get("content")
+                        if delta:
+                            tokens += 1
+                            yield delta
+            finally:
+                # One delta is roughly one token when the upstream sends no usage block.
+                tokens = (usage or {}).get("completion_tokens") or tokens
+                if tokens:
+                    metrics.LLM_TOKENS.labels(model).inc(tokens)
+                self._observe_total(model, "stream", status, start)
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+from app.llm_client import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+# Auth problems are the same for every model, so there's no point failing over.
+FATAL_STATUSES = (401, 403)
+
+
+class RouterError(Exception):
+    """No model produced an answer within the attempt budget or deadline."""
+
+
+class StreamInterrupted(RouterError):
+    """A stream failed after some of its text had already been yielded."""
+
+
+def _is_fatal(error: Exception) -> bool:
+    return isinstance(error, UpstreamError) and error.status_code in FATAL_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: after `threshold` consecutive failures the model is
+    skipped for `cooldown` seconds, then a single trial request decides
+    whether it closes again or goes back to cooling down.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_until = 0.0
+        self._trial = False
+
+    def available(self, now: float) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return now >= self.opened_until
+        return not self._trial
+
+    def on_start(self, now: float):
+        if self.state == "open" and now >= self.opened_until:
+            self.state = "half_open"
+        if self.state == "half_open":
+            self._trial = True
+
+    def on_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def on_cancel(self):
+        # An abandoned trial proves nothing either way; let the next request try.
+        self._trial = False
+
+    def on_failure(self, now: float):
+        self.failures += 1
+        self._trial = False
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state = "open"
+            self.opened_until = now + self.cooldown
+
+
+class ModelStats:
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+
+    def percentile(self, pct: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class ModelRouter:
+    """
+    Routes completions over an ordered list of models.
+
+    Each attempt goes to the first model whose breaker is closed (rotating
+    on retries). If it hasn't answered by its own p`hedge_percentile`
+    latency, a hedged request goes to the next model and whichever succeeds
+    first wins; the other is cancelled. Failed attempts back off with full
+    jitter, and everything is bounded by a per-request deadline.
+    """
+
+    def __init__(
+        self,
+        client,
+        models: list,
+        max_attempts: int = 4,
+        deadline: float = 40.0,
+        breaker_threshold: int = 3,
+        breaker_cooldown: float = 30.0,
+        backoff_base: float = 0.25,
+        backoff_cap: float = 4.0,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        hedge_initial_delay: float = 10.0,
+        hedge_min_delay: float = 0.25,
+        latency_window: int = 200,
+    ):
+        if not models:
+            raise ValueError("At least one model is required")
+        self.client = client
+        self.models = list(models)
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.breakers = {m: CircuitBreaker(breaker_threshold, breaker_cooldown) for m in self.models}
+        self.stats = {m: ModelStats(latency_window) for m in self.models}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._random = random.Random()
+
+    # -------------------------
+    # Bookkeeping (also used by the streaming path)
+    # -------------------------
+    def available(self) -> list:
+        now = time.monotonic()
+        return [m for m in self.models if self.breakers[m].available(now)]
+
+    def on_start(self, model: str):
+        self.breakers[model].on_start(time.monotonic())
+
+    def on_success(self, model: str, latency: float = None):
+        self.breakers[model].on_success()
+        self.stats[model].successes += 1
+        if latency is not None:
+            self.stats[model].latencies.append(latency)
+
+    def on_failure(self, model: str):
+        self.breakers[model].on_failure(time.monotonic())
+        self.stats[model].failures += 1
+
+    def on_cancel(self, model: str):
+        self.breakers[model].on_cancel()
+
+    def on_error(self, model: str, error: Exception):
+        # A rejected API key says nothing about the model's health.
+        if _is_fatal(error):
+            self.on_cancel(model)
+        else:
+            self.on_failure(model)
+
+    def backoff(self, attempt: int) -> float:
+        return self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def hedge_delay(self, model: str):
+        if not self.hedge_percentile:
+            return None
+        stats = self.stats[model]
+        if len(stats.latencies) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return max(self.hedge_min_delay, stats.percentile(self.hedge_percentile))
+
+    # -------------------------
+    # Requests
+    # -------------------------
+    async def _attempt(self, model: str, payload_for, headers: dict) -> str:
+        self.on_start(model)
+        start = time.monotonic()
+        try:
+            response = await self.client.post(payload_for(model), headers)
+            if response.status_code != 200:
+                raise UpstreamError(response.status_code, response.text)
+            message = response.json()["choices"][0]["message"]["content"].strip()
+            if not message:
+                raise ValueError("Empty LLM response")
+        except asyncio.CancelledError:
+            # Lost a hedge race or the caller went away. Release a half-open
+            # trial so the model isn't left unavailable forever.
+            self.on_cancel(model)
+            raise
+        except Exception as e:
+            self.on_error(model, e)
+            raise
+        self.on_success(model, time.monotonic() - start)
+        return message
+
+    async def _hedged(self, primary: str, backup: str, payload_for, headers: dict, deadline: float) -> str:
+        # Maps each in-flight task to (model, whether it is the hedge).
+        tasks = {asyncio.ensure_future(self._attempt(primary, payload_for, headers)): (primary, False)}
+        try:
+            # A hedge only helps if it goes to a different model.
+            delay = self.hedge_delay(primary) if backup is not None else None
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=min(delay, max(0.0, deadline - time.monotonic())))
+                if not done and time.monotonic() < deadline and self.breakers[backup].available(time.monotonic()):
+                    self.hedges += 1
+                    logger.info("llm_hedge", extra={"model": primary, "backup": backup, "after": round(delay, 3)})
+                    tasks[asyncio.ensure_future(self._attempt(backup, payload_for, headers))] = (backup, True)
+
+            error = None
+            while tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Still running at the deadline counts as a failure (a timeout).
+                    for model in {model for model, _ in tasks.values()}:
+                        self.on_failure(model)
+                    raise asyncio.TimeoutError("LLM request deadline exceeded")
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    _, hedge = tasks.pop(task)
+                    if task.exception() is None:
+                        self.hedge_wins += hedge
+                        return task.result()
+                    error = task.exception()
+                    if _is_fatal(error):
+                        raise error
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def complete(self, payload_for, headers: dict, max_attempts: int = None) -> str:
+        """
+        Return the first successful completion. payload_for(model) builds the
+        request body for a given model. Raises UpstreamError for auth
+        failures and RouterError when every attempt fails.
+        """
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(max_attempts or self.max_attempts):
+            candidates = self.available()
+            if not candidates:
+                raise RouterError("All models are cooling down after repeated failures")
+            primary = candidates[attempt % len(candidates)]
+            others = [m for m in candidates if m != primary]
+            backup = others[0] if others else None
+            try:
+                logger.info("llm_request", extra={"model": primary, "attempt": attempt + 1})
+                return await self._hedged(primary, backup, payload_for, headers, deadline)
+            except Exception as e:
+                if _is_fatal(e):
+                    raise
+                last_error = e
+            logger.warning(
+                "llm_failed", extra={"model": primary, "attempt": attempt + 1, "error": repr(last_error)}
+            )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, self.backoff(attempt)))
+        raise RouterError(f"All AI models failed: {last_error!r}")
+
+    async def stream(self, payload_for, headers: dict, max_attempts: int = None):
+        """
+        Yield completion deltas from the first model that produces any.
+
+        Model choice, breakers, auth handling, backoff and the deadline are
+        the same as in complete(), and failover works the same way until the
+        first delta has been yielded. After that a failure raises
+        StreamInterrupted, since text already sent can't be taken back.
+        Streams are not hedged.
+        """
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(max_attempts or self.max_attempts):
+            candidates = self.available()
+            if not candidates:
+                raise RouterError("All models are cooling down after repeated failures")
+            model = candidates[attempt % len(candidates)]
+            logger.info("llm_stream", extra={"model": model, "attempt": attempt + 1})
+            self.on_start(model)
+            deltas = self.client.stream(payload_for(model), headers)
+            sent = False
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("LLM request deadline exceeded")
+                    try:
+                        delta = await asyncio.wait_for(deltas.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        break
+                    sent = True
+                    yield delta
+                if not sent:
+                    raise ValueError("Empty LLM response")
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away mid-stream: release a half-open trial.
+                self.on_cancel(model)
+                raise
+            except Exception as e:
+                self.on_error(model, e)
+                if _is_fatal(e):
+                    raise
+                if sent:
+                    raise StreamInterrupted(f"Stream from {model} interrupted: {e!r}") from e
+                last_error = e
+                logger.warning(
+                    "llm_stream_failed", extra={"model": model, "attempt": attempt + 1, "error": repr(e)}
+                )
+            else:
+                self.on_success(model)
+                return
+            finally:
+                await deltas.aclose()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, self.backoff(attempt)))
+        raise RouterError(f"All AI models failed: {last_error!r}")
+
+    def state(self) -> dict:
+        now = time.monotonic()
+        models = []
+        for model in self.models:
+            breaker, stats = self.breakers[model], self.stats[model]
+            p50, p95 = stats.percentile(50), stats.percentile(95)
+            models.append({
+                "model": model,
+                "state": breaker.state,
+                "available": breaker.available(now),
+                "consecutive_failures": breaker.failures,
+                "retry_in": round(max(0.0, breaker.opened_until - now), 2) if breaker.state == "open" else 0.0,
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "p50_latency": round(p50, 3) if p50 is not None else None,
+                "p95_latency": round(p95, 3) if p95 is not None else None,
+                "hedge_after": self.hedge_delay(model),
+            })
+        return {
+            "models": models,
+            "deadline": self.deadline,
+            "max_attempts": self.max_attempts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
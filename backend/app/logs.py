@@ -0,0 +1,58 @@
+"""
+Structured logging setup.
+
+Log calls pass their fields through `extra`, e.g.
+    logger.info("llm_request", extra={"model": model, "attempt": 2})
+LOG_FORMAT=json (the default) emits one JSON object per line for log
+shippers; LOG_FORMAT=text keeps the fields readable in a terminal.
+"""
+import json
+import logging
+import os
+import time
+
+# Attributes every LogRecord has; anything else came in through `extra`.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in _fields(record).items())
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        line = f"{stamp} {record.levelname:<7} {record.name} {record.getMessage()} {fields}".rstrip()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level: str = None, fmt: str = None):
+    """Install a single stream handler on the "app" logger (idempotent)."""
+    logger = logging.getLogger("app")
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if any(getattr(h, "_app_handler", False) for h in logger.handlers):
+        return logger
+    handler = logging.StreamHandler()
+    handler._app_handler = True
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+    handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
@@ -1,21 +1,110 @@
-print("Running main.py with Google Gemma integration at", __file__)
-
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 try:
     from fastapi_cors import CORSMiddleware
 except ImportError:
     from fastapi.middleware.cors import CORSMiddleware
 
-import sqlite3
-import requests
+import asyncio
+import logging
 import os
 import re
 from dotenv import load_dotenv
 import uvicorn
 
+from app import metrics
+from app.analyzer import CodeAnalyzer
+from app.executor import ExecutorBusy, create_engine, limits_from_env
+from app.judge import judge_batch
+from app.leaderboard import LeaderboardStore
+from app.llm_cache import ResponseCache, cache_key
+from app.llm_client import LLMClient, UpstreamError
+from app.llm_router import ModelRouter, RouterError, StreamInterrupted
+from app.logs import configure_logging
+from app.streaming import ANALYZE_SECTIONS, SectionParser, sse
+
 load_dotenv()
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger(__name__)
+logger.info("app_start", extra={"file": __file__})
+
+# =========================
+# OpenRouter Models
+# =========================
+PRIMARY_MODEL = "mistralai/mistral-7b-instruct:free"
+FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL") or None
+TEMPERATURE = 0.6
+
+# Ordered preference list, e.g. LLM_MODELS="model-a,model-b,model-c".
+LLM_MODELS = [
+    m.strip()
+    for m in os.getenv("LLM_MODELS", ",".join(filter(None, [PRIMARY_MODEL, FALLBACK_MODEL]))).split(",")
+    if m.strip()
+]
+
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# One pooled client shared by every request; opened and closed with the app.
+llm = LLMClient(
+    OPENROUTER_URL,
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+)
+
+# Circuit breaking, hedging and failover across LLM_MODELS.
+router = ModelRouter(
+    llm,
+    LLM_MODELS,
+    max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "4")),
+    deadline=float(os.getenv("LLM_DEADLINE", "40")),
+    breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "3")),
+    breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+    backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.25")),
+    backoff_cap=float(os.getenv("LLM_BACKOFF_CAP", "4")),
+    hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+    hedge_initial_delay=float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "10")),
+)
+
+# Completions keyed by prompt + sampling params. Set LLM_CACHE_PATH to keep
+# answers across restarts.
+cache = ResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    disk_path=os.getenv("LLM_CACHE_PATH") or None,
+)
+
+# =========================
+# Code execution
+# =========================
+# "local" runs submissions on a pool of sandboxed worker processes;
+# "piston" forwards them to the public Piston API.
+executor = create_engine(
+    os.getenv("EXECUTION_BACKEND", "local"),
+    workers=int(os.getenv("EXEC_WORKERS", "2")),
+    max_jobs_per_worker=int(os.getenv("EXEC_MAX_JOBS_PER_WORKER", "100")),
+    queue_size=int(os.getenv("EXEC_QUEUE_SIZE", "32")),
+    limits=limits_from_env(),
+    start_method=os.getenv("EXEC_START_METHOD", "spawn"),
+)
+MAX_BATCH_CASES = int(os.getenv("EXEC_MAX_BATCH_CASES", "100"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await executor.start()
+    await leaderboard.start()
+    async with llm:
+        yield
+    await leaderboard.aclose()
+    await executor.aclose()
+    cache.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # =========================
 # CORS
@@ -29,93 +118,174 @@ app.add_middleware(
 )
 
 # =========================
-# In-memory leaderboard
+# Metrics
 # =========================
-app.db = sqlite3.connect(":memory:", check_same_thread=False)
-app.db.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT UNIQUE,
-    score INTEGER
+# Outermost, so the recorded latency includes every other middleware.
+# SERVER_TIMING=1 adds a per-request Server-Timing breakdown (llm, exec, db).
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    server_timing=os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes"),
 )
-""")
-app.db.execute("""
-INSERT OR IGNORE INTO users (name, score)
-VALUES (?, ?)
-""", ("user", 0))
-app.db.commit()
 
 # =========================
-# OpenRouter Models
+# Static analysis
 # =========================
-PRIMARY_MODEL = "mistralai/mistral-7b-instruct:free"
-FALLBACK_MODEL = None
+analyzer = CodeAnalyzer(
+    cache_size=int(os.getenv("SUGGEST_CACHE_SIZE", "256")),
+    chunk_cache_size=int(os.getenv("SUGGEST_CHUNK_CACHE_SIZE", "4096")),
+)
+MAX_SUGGEST_CHARS = int(os.getenv("SUGGEST_MAX_CHARS", "500000"))
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# =========================
+# Leaderboard
+# =========================
+# File-backed so scores survive restarts and are shared between workers.
+leaderboard = LeaderboardStore(
+    os.getenv("LEADERBOARD_DB", "leaderboard.db"),
+    readers=int(os.getenv("LEADERBOARD_READERS", "4")),
+    batch_size=int(os.getenv("LEADERBOARD_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("LEADERBOARD_FLUSH_INTERVAL", "0.05")),
+    snapshot_size=int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", "100")),
+)
+MAX_SCORE_POINTS = int(os.getenv("LEADERBOARD_MAX_POINTS", "1000000"))
 
 # =========================
 # AI Call Utility
 # =========================
-def call_llm(prompt: str, max_tokens: int = 800, retries: int = 1) -> str:
+async def call_llm(prompt: str, max_tokens: int = 800, retries: int = 1) -> str:
+    key = cache_key(prompt, LLM_MODELS[0], max_tokens, TEMPERATURE)
+    return await cache.get_or_compute(
+        key, lambda: _request_completion(prompt, max_tokens, retries)
+    )
+
+
+def _openrouter_headers() -> dict:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Missing OpenRouter API key")
 
-    headers = {
+    return {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
         "HTTP-Referer": "https://ai-tutor-platform-theta.vercel.app",
         "X-Title": "AI Tutor Platform"
     }
 
-    models_to_try = [PRIMARY_MODEL, FALLBACK_MODEL]
-
-    for model in models_to_try:
-        payload = {
-            "model": "mistralai/mistral-7b-instruct:free",
-            "messages": [
-            {"role": "system", "content": "You are an expert computer science tutor."},
-            {"role": "user", "content": prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": 0.6,
-            "top_p": 0.9
-        }
 
+def _build_payload(model: str, prompt: str, max_tokens: int) -> dict:
+    return {
+        "model": model,
+        "messages": [
+        {"role": "system", "content": "You are an expert computer science tutor."},
+        {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": TEMPERATURE,
+        "top_p": 0.9
+    }
 
-        for attempt in range(retries + 1):
-            try:
-                print(f"🔁 LLM Request | Model={model} | Attempt={attempt + 1}")
 
-                response = requests.post(
-                    OPENROUTER_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=30
-                )
+async def _request_completion(prompt: str, max_tokens: int, retries: int) -> str:
+    headers = _openrouter_headers()
 
-                if response.status_code != 200:
-                    print(f"⚠️ OpenRouter Error {response.status_code}: {response.text}")
-                    continue
+    try:
+        return await router.complete(
+            lambda model: _build_payload(model, prompt, max_tokens),
+            headers,
+            max_attempts=(retries + 1) * len(router.models),
+        )
+    except UpstreamError as e:
+        logger.error("llm_rejected", extra={"status": e.status_code, "body": e.body[:500]})
+        raise HTTPException(status_code=500, detail="OpenRouter rejected the API key")
+    except RouterError as e:
+        logger.error("llm_all_failed", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail="All AI models failed")
+
+
+async def stream_llm(prompt: str, max_tokens: int = 800, retries: int = 1):
+    """
+    Yield completion text as it is generated.
+
+    A cached answer is replayed as a single chunk. Otherwise the router
+    streams from the first healthy model, with the same failover rules as
+    call_llm until text has been sent. The full text is cached once the
+    stream completes so later blocking calls can reuse it.
+    """
+    key = cache_key(prompt, LLM_MODELS[0], max_tokens, TEMPERATURE)
+    cached = await cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    headers = _openrouter_headers()
+
+    chunks = []
+    deltas = router.stream(
+        lambda model: _build_payload(model, prompt, max_tokens),
+        headers,
+        max_attempts=(retries + 1) * len(router.models),
+    )
+    try:
+        async for delta in deltas:
+            chunks.append(delta)
+            yield delta
+    except UpstreamError as e:
+        logger.error("llm_rejected", extra={"status": e.status_code, "body": e.body[:500]})
+        raise HTTPException(status_code=500, detail="OpenRouter rejected the API key")
+    except StreamInterrupted as e:
+        logger.error("llm_stream_interrupted", extra={"error": str(e)})
+        raise HTTPException(status_code=502, detail="AI stream interrupted")
+    except RouterError as e:
+        logger.error("llm_all_failed", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail="All AI models failed")
+    finally:
+        # Closed right away (not when garbage collected) if the client disconnects.
+        await deltas.aclose()
+
+    await cache.set(key, "".join(chunks).strip())
+
+
+def _wants_stream(data: dict, request: Request) -> bool:
+    return bool(data.get("stream")) or "text/event-stream" in request.headers.get("accept", "")
+
+
+def _event_stream(events):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-                data = response.json()
+# =========================
+# /analyze
+# =========================
+def _parse_analysis(response: str) -> dict:
+    math_match = re.search(r"Math Explanation:\s*(.*?)Pseudocode:", response, re.S | re.I)
+    pseudo_match = re.search(r"Pseudocode:\s*(.*)", response, re.S | re.I)
 
-                message = data["choices"][0]["message"]["content"].strip()
-                if not message:
-                    raise ValueError("Empty LLM response")
+    return {
+        "mathExplanation": math_match.group(1).strip() if math_match else "Not found",
+        "pseudoCode": pseudo_match.group(1).strip() if pseudo_match else "Not found"
+    }
 
-                return message
 
-            except Exception as e:
-                print(f"❌ Model {model} failed: {e}")
+async def _analyze_events(prompt: str):
+    parser = SectionParser(ANALYZE_SECTIONS)
+    chunks = []
+    try:
+        async for delta in stream_llm(prompt):
+            chunks.append(delta)
+            for event in parser.feed(delta):
+                yield sse(event.pop("event"), event)
+        for event in parser.close():
+            yield sse(event.pop("event"), event)
+        yield sse("done", _parse_analysis("".join(chunks).strip()))
+    except HTTPException as e:
+        yield sse("error", {"detail": e.detail})
 
-    raise HTTPException(status_code=500, detail="All AI models failed")
 
-# =========================
-# /analyze
-# =========================
 @app.post("/analyze")
-async def analyze_problem(data: dict):
+async def analyze_problem(data: dict, request: Request):
     problem = data.get("problem", "").strip()
     if not problem:
         raise HTTPException(status_code=400, detail="Problem is required")
@@ -144,21 +314,28 @@ Pseudocode:
 ...
 """
 
-    response = call_llm(prompt)
-
-    math_match = re.search(r"Math Explanation:\s*(.*?)Pseudocode:", response, re.S | re.I)
-    pseudo_match = re.search(r"Pseudocode:\s*(.*)", response, re.S | re.I)
+    if _wants_stream(data, request):
+        return _event_stream(_analyze_events(prompt))
 
-    return {
-        "mathExplanation": math_match.group(1).strip() if math_match else "Not found",
-        "pseudoCode": pseudo_match.group(1).strip() if pseudo_match else "Not found"
-    }
+    response = await call_llm(prompt)
+    return _parse_analysis(response)
 
 # =========================
 # /chat-explain
 # =========================
+async def _chat_events(prompt: str):
+    chunks = []
+    try:
+        async for delta in stream_llm(prompt, max_tokens=400):
+            chunks.append(delta)
+            yield sse("token", {"text": delta})
+        yield sse("done", {"response": "".join(chunks).strip()})
+    except HTTPException as e:
+        yield sse("error", {"detail": e.detail})
+
+
 @app.post("/chat-explain")
-async def chat_explain(data: dict):
+async def chat_explain(data: dict, request: Request):
     question = data.get("question", "").strip()
     context = data.get("context", "").strip()
 
@@ -175,7 +352,10 @@ User Question:
 Answer clearly and simply.
 """
 
-    response = call_llm(prompt, max_tokens=400)
+    if _wants_stream(data, request):
+        return _event_stream(_chat_events(prompt))
+
+    response = await call_llm(prompt, max_tokens=400)
     return {"response": response}
 
 # =========================
@@ -183,23 +363,85 @@ Answer clearly and simply.
 # =========================
 @app.post("/execute")
 async def execute_code(data: dict):
-    import io, sys
-    from contextlib import redirect_stdout
-
     source = data.get("source", "")
     stdin = data.get("stdin", "")
 
     if not source:
         raise HTTPException(status_code=400, detail="Source code required")
+    if not isinstance(stdin, str):
+        raise HTTPException(status_code=400, detail="stdin must be a string")
 
     try:
-        buffer = io.StringIO()
-        sys.stdin = io.StringIO(stdin)
-        with redirect_stdout(buffer):
-            exec(source, {})
-        return {"output": buffer.getvalue() or "No output"}
-    except Exception as e:
-        return {"output": f"Execution Error: {e}"}
+        result = await executor.run(source, stdin)
+    except ExecutorBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Execution queue is full, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    if not result["output"] and not result["error"]:
+        result["output"] = "No output"
+    return result
+
+# =========================
+# /execute/batch
+# =========================
+async def _judge(source: str, cases: list, stop_on_failure: bool):
+    """Yield (event, data) pairs: one "case" per finished test case, then "done"."""
+    summary = {"total": len(cases), "completed": 0, "passed": 0, "failed": 0,
+               "stopped_early": False, "compile_error": None}
+    try:
+        async for case in judge_batch(executor, source, cases, stop_on_failure):
+            summary["completed"] += 1
+            summary["passed" if case["verdict"] == "pass" else "failed"] += 1
+            yield "case", case
+    except SyntaxError as e:
+        summary["compile_error"] = f"{type(e).__name__}: {e}"
+    summary["stopped_early"] = summary["compile_error"] is None and summary["completed"] < len(cases)
+    yield "done", summary
+
+
+async def _batch_events(source: str, cases: list, stop_on_failure: bool):
+    async for event, data in _judge(source, cases, stop_on_failure):
+        yield sse(event, data)
+
+
+@app.post("/execute/batch")
+async def execute_batch(data: dict, request: Request):
+    source = data.get("source", "")
+    cases = data.get("cases")
+    stop_on_failure = bool(data.get("stop_on_failure", False))
+
+    if not source:
+        raise HTTPException(status_code=400, detail="Source code required")
+    if not isinstance(cases, list) or not cases or not all(isinstance(c, dict) for c in cases):
+        raise HTTPException(status_code=400, detail="cases must be a non-empty list of {stdin, expected}")
+    if len(cases) > MAX_BATCH_CASES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CASES} cases per batch")
+    for i, case in enumerate(cases):
+        if not isinstance(case.get("stdin", ""), str):
+            raise HTTPException(status_code=400, detail=f"cases[{i}].stdin must be a string")
+        if not isinstance(case.get("expected"), (str, type(None))):
+            raise HTTPException(status_code=400, detail=f"cases[{i}].expected must be a string or null")
+
+    if _wants_stream(data, request):
+        return _event_stream(_batch_events(source, cases, stop_on_failure))
+
+    results = []
+    async for event, payload in _judge(source, cases, stop_on_failure):
+        if event == "case":
+            results.append(payload)
+        else:
+            summary = payload
+    return {"cases": sorted(results, key=lambda c: c["index"]), **summary}
+
+# =========================
+# /execute-stats
+# =========================
+@app.get("/execute-stats")
+async def execute_stats():
+    return executor.stats()
 
 # =========================
 # /suggest
@@ -207,26 +449,86 @@ async def execute_code(data: dict):
 @app.post("/suggest")
 async def suggest_code(data: dict):
     code = data.get("code", "")
-    suggestions = []
+    if len(code) > MAX_SUGGEST_CHARS:
+        raise HTTPException(status_code=400, detail="Code is too large to analyze")
 
-    if "for" in code:
-        suggestions.append("Consider list comprehensions for cleaner loops.")
-    if "try" not in code:
-        suggestions.append("Add try-except blocks for error handling.")
-    if "input" in code:
-        suggestions.append("Validate user input to avoid runtime errors.")
-
-    return {"suggestions": suggestions}
+    # Repeat submissions are answered from the cache on the loop; real work
+    # runs in a thread so a large file doesn't stall other requests.
+    result = analyzer.cached(code)
+    if result is None:
+        result = await asyncio.to_thread(analyzer.analyze, code)
+    return result
 
 # =========================
 # /leaderboard
 # =========================
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
 @app.get("/leaderboard")
-async def leaderboard():
-    cur = app.db.execute(
-        "SELECT name, score FROM users ORDER BY score DESC LIMIT 10"
-    )
-    return [{"name": r[0], "score": r[1]} for r in cur.fetchall()]
+async def get_leaderboard(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    # Top pages come pre-serialized from the in-memory snapshot, so polling
+    # clients never reach the database and unchanged boards cost a 304.
+    page = await leaderboard.top_page(limit) if offset == 0 else None
+    if page is None:
+        return await leaderboard.top(limit, offset)
+
+    body, etag = page
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/leaderboard/{name}")
+async def get_rank(name: str):
+    entry = await leaderboard.rank_of(name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return entry
+
+# =========================
+# /score
+# =========================
+@app.post("/score")
+async def add_score(data: dict):
+    name = str(data.get("name", "")).strip()
+    points = data.get("points")
+
+    if not name or len(name) > 64:
+        raise HTTPException(status_code=400, detail="Name is required (max 64 characters)")
+    if not isinstance(points, int) or isinstance(points, bool):
+        raise HTTPException(status_code=400, detail="Points must be an integer")
+    if abs(points) > MAX_SCORE_POINTS:
+        raise HTTPException(
+            status_code=400, detail=f"Points must be between -{MAX_SCORE_POINTS} and {MAX_SCORE_POINTS}"
+        )
+
+    score = await leaderboard.add_score(name, points)
+    return {"name": name, "score": score}
+
+# =========================
+# /cache-stats
+# =========================
+@app.get("/cache-stats")
+async def cache_stats():
+    return cache.stats()
+
+# =========================
+# /metrics
+# =========================
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # =========================
 # /list-models
@@ -234,8 +536,9 @@ async def leaderboard():
 @app.get("/list-models")
 async def list_models():
     return {
-        "primary": PRIMARY_MODEL,
-        "fallback": FALLBACK_MODEL
+        "primary": LLM_MODELS[0],
+        "fallback": LLM_MODELS[1] if len(LLM_MODELS) > 1 else None,
+        "routing": router.state(),
     }
 
 # =========================
@@ -0,0 +1,270 @@
+"""
+In-process request metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects keyed by label
+values; recording one is a dict lookup, a bisect and a few additions under a
+lock, so it is cheap enough to leave on. Each uvicorn worker keeps its own
+numbers, so with several workers scrape every worker (or run one per pod).
+
+Code that wants its timing in the response's Server-Timing header wraps the
+work in `timed(...)` with a timing name; the middleware collects those for
+the current request through a context variable.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_timings = contextvars.ContextVar("server_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).append(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_label_text(self.labelnames, values)} {child.value:g}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, values, le)} {cumulative}")
+        labels = _label_text(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {total:.6f}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render(registry=None) -> str:
+    lines = []
+    for metric in REGISTRY if registry is None else registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Server-Timing
+# -------------------------
+class _RequestTimings:
+    # Closed when the request ends: background tasks started lazily inside a
+    # request inherit its context and must not keep appending afterwards.
+    __slots__ = ("entries", "open")
+
+    def __init__(self):
+        self.entries = []
+        self.open = True
+
+
+def add_timing(name: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None and timings.open:
+        timings.entries.append((name, seconds))
+
+
+@contextmanager
+def timed(histogram, timing: str = None):
+    """Observe the block's duration on `histogram` (a labelled child) and optionally in Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed)
+        if timing:
+            add_timing(timing, elapsed)
+
+
+def _server_timing(timings, total: float) -> bytes:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings]
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts).encode()
+
+
+# -------------------------
+# Metrics recorded by the app
+# -------------------------
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served", ["route"])
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until the response body is complete",
+    ["method", "route", "status"],
+)
+LLM_QUEUE_WAIT = Histogram("llm_queue_wait_seconds", "Wait for an upstream concurrency slot", ["model"])
+LLM_TTFB = Histogram("llm_ttfb_seconds", "Time until upstream response headers", ["model", "mode"])
+LLM_DURATION = Histogram("llm_request_duration_seconds", "Total upstream call time", ["model", "mode", "status"])
+LLM_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens received", ["model"])
+EXEC_RUN = Histogram("exec_run_seconds", "Submission run time inside the sandbox", ["backend", "status"])
+EXEC_QUEUE_WAIT = Histogram("exec_queue_wait_seconds", "Wait for a free execution worker", ["backend"])
+DB_QUERY = Histogram(
+    "db_query_seconds",
+    "Leaderboard SQLite time per operation",
+    ["op"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (so streaming responses pass through untouched)
+    recording in-flight requests and latency per route template, e.g.
+    "/leaderboard/{name}" rather than every distinct path. With
+    server_timing=True it also adds a Server-Timing header built from the
+    `timed(...)` blocks that finished before the response started.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+        self._static_routes = {}
+
+    def _route(self, scope) -> str:
+        path = scope["path"]
+        template = self._static_routes.get(path)
+        if template is not None:
+            return template
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                if not getattr(route, "param_convertors", None):
+                    self._static_routes[path] = route.path
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = self._route(scope)
+        in_flight = HTTP_IN_FLIGHT.labels(route)
+        timings = _RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(timings.entries, time.perf_counter() - start)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            timings.open = False
+            _timings.reset(token)
+            HTTP_DURATION.labels(scope["method"], route, status).observe(time.perf_counter() - start)
@@ -0,0 +1,82 @@
+import json
+import re
+
+# (response key, marker) pairs for the /analyze prompt's "Format strictly as" block.
+ANALYZE_SECTIONS = [
+    ("mathExplanation", "Math Explanation:"),
+    ("pseudoCode", "Pseudocode:"),
+]
+
+
+def sse(event: str, data) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class SectionParser:
+    """
+    Incrementally split streamed LLM text on section markers.
+
+    feed() returns the events the new text unlocks:
+      {"event": "token", "section": key, "text": ...}      as text arrives
+      {"event": "section", "section": key, "content": ...} when a section ends
+    Text before the first marker is reported with section None. A marker
+    split across chunks is held back until it can be recognised.
+    """
+
+    def __init__(self, sections):
+        self._markers = [(key, marker.lower()) for key, marker in sections]
+        self._keys = {marker: key for key, marker in self._markers}
+        self._pattern = re.compile(
+            "|".join(re.escape(marker) for _, marker in self._markers), re.I
+        )
+        self._section = None
+        self._buffer = ""
+        self._content = []
+
+    def _held_suffix(self) -> int:
+        """Length of the longest buffer suffix that could still grow into a marker."""
+        longest = 0
+        for _, marker in self._markers:
+            for size in range(min(len(marker) - 1, len(self._buffer)), longest, -1):
+                if marker.startswith(self._buffer[-size:].lower()):
+                    longest = size
+                    break
+        return longest
+
+    def _emit(self, text: str, events: list):
+        if text:
+            self._content.append(text)
+            events.append({"event": "token", "section": self._section, "text": text})
+
+    def _finish_section(self, events: list):
+        if self._section is not None:
+            events.append({
+                "event": "section",
+                "section": self._section,
+                "content": "".join(self._content).strip(),
+            })
+        self._content = []
+
+    def feed(self, text: str) -> list:
+        events = []
+        self._buffer += text
+        match = self._pattern.search(self._buffer)
+        while match:
+            self._emit(self._buffer[:match.start()], events)
+            self._finish_section(events)
+            self._section = self._keys[match.group(0).lower()]
+            self._buffer = self._buffer[match.end():]
+            match = self._pattern.search(self._buffer)
+
+        release = len(self._buffer) - self._held_suffix()
+        self._emit(self._buffer[:release], events)
+        self._buffer = self._buffer[release:]
+        return events
+
+    def close(self) -> list:
+        events = []
+        self._emit(self._buffer, events)
+        self._buffer = ""
+        self._finish_section(events)
+        return events
@@ -0,0 +1,93 @@
+"""
+Throughput and tail latency of the /execute engine under a mixed workload.
+
+Submits a mix of short jobs (print a line) and long jobs (a CPU-bound loop)
+from `--clients` concurrent callers straight to ProcessPoolEngine, and
+reports jobs/s plus p50/p95/p99 latency per job kind. Rejections from the
+bounded queue are counted separately; callers back off briefly and retry,
+as the frontend would on a 503.
+
+    python -m benchmarks.bench_executor --jobs 200 --clients 16 --workers 4
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.executor import ExecutionLimits, ExecutorBusy, ProcessPoolEngine
+
+SHORT_JOB = "name = input()\nprint(f'hello {name}')"
+LONG_JOB = "total = 0\nfor i in range({n}):\n    total += i * i\nprint(total)"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(args):
+    engine = ProcessPoolEngine(
+        workers=args.workers,
+        max_jobs_per_worker=args.max_jobs_per_worker,
+        queue_size=args.queue_size,
+        limits=ExecutionLimits(cpu_seconds=5, wall_seconds=10),
+    )
+    rng = random.Random(args.seed)
+    kinds = ["long" if rng.random() < args.long_ratio else "short" for _ in range(args.jobs)]
+    latencies = {"short": [], "long": []}
+    rejected = 0
+    pending = iter(kinds)
+
+    async def client():
+        nonlocal rejected
+        for kind in pending:
+            source = LONG_JOB.format(n=args.long_iterations) if kind == "long" else SHORT_JOB
+            start = time.perf_counter()
+            while True:
+                try:
+                    result = await engine.run(source, "bench\n")
+                    break
+                except ExecutorBusy:
+                    rejected += 1
+                    await asyncio.sleep(0.05)
+            assert result["status"] == "ok", result
+            latencies[kind].append(time.perf_counter() - start)
+
+    async with engine:
+        # Let the pre-forked workers finish booting so startup isn't measured.
+        await asyncio.gather(*(engine.run("pass") for _ in range(args.workers)))
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.clients)))
+        wall = time.perf_counter() - start
+        stats = engine.stats()
+
+    return wall, latencies, rejected, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--max-jobs-per-worker", type=int, default=100)
+    parser.add_argument("--long-ratio", type=float, default=0.2)
+    parser.add_argument("--long-iterations", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    wall, latencies, rejected, stats = asyncio.run(run(args))
+    total = sum(len(v) for v in latencies.values())
+    print(f"jobs={total} clients={args.clients} workers={args.workers} wall={wall:.2f}s "
+          f"throughput={total / wall:.1f} jobs/s rejected={rejected} recycled={stats['recycled']}")
+    for kind, values in latencies.items():
+        if values:
+            print(f"{kind:<6} n={len(values):<4} p50={statistics.median(values) * 1000:7.1f}ms "
+                  f"p95={percentile(values, 95) * 1000:7.1f}ms p99={percentile(values, 99) * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
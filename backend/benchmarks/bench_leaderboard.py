@@ -0,0 +1,135 @@
+"""
+/leaderboard latency with a large user table under concurrent score writes.
+
+Seeds a SQLite leaderboard with `--users` rows, serves the app with
+LEADERBOARD_DB pointing at it, then runs `--writers` clients posting to
+/score for random users while `--readers` clients poll /leaderboard (and
+occasionally /leaderboard/{name}). Reports read latency percentiles,
+write throughput and how well the writes were batched. With --revalidate
+the readers poll like browsers do, sending If-None-Match with the last
+ETag, and the share of 304 responses is reported.
+
+    python -m benchmarks.bench_leaderboard --users 1000000 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import httpx
+
+from app.leaderboard import SCHEMA
+from benchmarks.stub_openrouter import serve
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def seed(path: str, users: int, rng: random.Random):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    with db:
+        db.executemany(
+            "INSERT OR IGNORE INTO users (name, score) VALUES (?, ?)",
+            ((f"student{i}", rng.randint(0, 100_000)) for i in range(users)),
+        )
+    db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+
+
+async def run(base_url: str, args, rng: random.Random):
+    reads, ranks, writes = [], [], []
+    not_modified = 0
+    limits = httpx.Limits(max_connections=args.readers + args.writers)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        # Give the app's startup work (execution workers booting) time to
+        # settle so it doesn't show up as read latency.
+        warmup_until = time.perf_counter() + args.warmup
+        while time.perf_counter() < warmup_until:
+            (await client.get("/leaderboard")).raise_for_status()
+            await asyncio.sleep(0.05)
+        deadline = time.perf_counter() + args.duration
+
+        async def reader():
+            nonlocal not_modified
+            etag = None
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if rng.random() < args.rank_ratio:
+                    r = await client.get(f"/leaderboard/student{rng.randrange(args.users)}")
+                    ranks.append(time.perf_counter() - start)
+                else:
+                    headers = {"If-None-Match": etag} if args.revalidate and etag else {}
+                    r = await client.get("/leaderboard", headers=headers)
+                    reads.append(time.perf_counter() - start)
+                    etag = r.headers.get("etag", etag)
+                    if r.status_code == 304:
+                        not_modified += 1
+                        continue
+                r.raise_for_status()
+
+        async def writer():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                r = await client.post("/score", json={
+                    "name": f"student{rng.randrange(args.users)}", "points": rng.randint(1, 50),
+                })
+                r.raise_for_status()
+                writes.append(time.perf_counter() - start)
+
+        await asyncio.gather(
+            *(reader() for _ in range(args.readers)),
+            *(writer() for _ in range(args.writers)),
+        )
+    return reads, ranks, writes, not_modified
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match like a polling browser")
+    parser.add_argument("--rank-ratio", type=float, default=0.05, help="share of reads that are rank lookups")
+    parser.add_argument("--app-port", type=int, default=9200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(), "leaderboard.db")
+    start = time.perf_counter()
+    seed(path, args.users, rng)
+    print(f"seeded {args.users} users in {time.perf_counter() - start:.1f}s ({path})")
+
+    os.environ["LEADERBOARD_DB"] = path
+    from app.main import app, leaderboard
+
+    with serve(app, port=args.app_port) as app_url:
+        reads, ranks, writes, not_modified = asyncio.run(run(app_url, args, rng))
+        stats = leaderboard.stats()
+
+    print(f"duration={args.duration}s readers={args.readers} writers={args.writers}")
+    for label, values in (("/leaderboard", reads), ("/leaderboard/{name}", ranks), ("POST /score", writes)):
+        if values:
+            print(f"{label:<20} n={len(values):<6} rps={len(values) / args.duration:8.1f} "
+                  f"p50={percentile(values, 50) * 1000:7.2f}ms p95={percentile(values, 95) * 1000:7.2f}ms "
+                  f"p99={percentile(values, 99) * 1000:7.2f}ms")
+    print(f"write batches={stats['batches']} avg users/batch={stats['avg_batch']} "
+          f"snapshot versions={stats['snapshot_version']} reloads={stats['snapshot_reloads']}")
+    if args.revalidate and reads:
+        print(f"304 Not Modified: {not_modified}/{len(reads)} ({not_modified / len(reads):.0%})")
+
+
+if __name__ == "__main__":
+    main()
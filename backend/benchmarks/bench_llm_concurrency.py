@@ -0,0 +1,80 @@
+"""
+Concurrent /analyze load against a local stub OpenRouter.
+
+Fires N simultaneous /analyze requests while polling /leaderboard, and reports
+total wall time and leaderboard latency. With a blocking call_llm the wall
+time grows as N x latency and /leaderboard stalls behind every LLM call; with
+the pooled async client the requests overlap (bounded by LLM_MAX_CONCURRENCY)
+and /leaderboard stays fast.
+
+    python -m benchmarks.bench_llm_concurrency --requests 32 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_openrouter import create_app, serve
+
+
+async def run(base_url: str, n: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        analyze_done = asyncio.Event()
+        board_latencies = []
+
+        async def poll_leaderboard():
+            while not analyze_done.is_set():
+                start = time.perf_counter()
+                await client.get("/leaderboard")
+                board_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        async def analyze(i: int):
+            start = time.perf_counter()
+            r = await client.post("/analyze", json={"problem": f"two sum variant {i}"})
+            r.raise_for_status()
+            return time.perf_counter() - start
+
+        poller = asyncio.create_task(poll_leaderboard())
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(analyze(i) for i in range(n)))
+        wall = time.perf_counter() - start
+        analyze_done.set()
+        await poller
+
+    return wall, latencies, board_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=32, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--app-port", type=int, default=9200)
+    args = parser.parse_args()
+
+    with serve(create_app(args.latency), port=args.stub_port) as stub_url:
+        os.environ["OPENROUTER_URL"] = f"{stub_url}/api/v1/chat/completions"
+        os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+        os.environ["LLM_MAX_CONNECTIONS"] = str(args.concurrency)
+
+        from app.main import app
+
+        with serve(app, port=args.app_port) as app_url:
+            wall, latencies, board = asyncio.run(run(app_url, args.requests))
+
+    print(f"requests={args.requests} stub_latency={args.latency}s concurrency={args.concurrency}")
+    print(f"wall time           : {wall:.2f}s (serial would be ~{args.requests * args.latency:.2f}s)")
+    print(f"/analyze p50 / max  : {statistics.median(latencies):.3f}s / {max(latencies):.3f}s")
+    if board:
+        print(f"/leaderboard p50/max: {statistics.median(board) * 1000:.1f}ms / {max(board) * 1000:.1f}ms "
+              f"over {len(board)} polls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time-to-first-token: blocking /analyze vs the SSE streaming mode.
+
+The stub OpenRouter waits `--latency` before the first token and then
+`--token-delay` per token. The blocking path can only respond after the whole
+completion; the streaming path should deliver its first token after roughly
+`--latency` and each section as soon as its marker closes. Every request uses
+a distinct problem so the response cache never answers.
+
+    python -m benchmarks.bench_streaming_ttft --runs 5 --latency 0.3 --token-delay 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_openrouter import create_app, serve
+
+
+async def blocking_run(client: httpx.AsyncClient, problem: str) -> dict:
+    start = time.perf_counter()
+    r = await client.post("/analyze", json={"problem": problem})
+    r.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return {"first_token": elapsed, "first_section": elapsed, "total": elapsed}
+
+
+async def streaming_run(client: httpx.AsyncClient, problem: str) -> dict:
+    timings = {}
+    start = time.perf_counter()
+    async with client.stream("POST", "/analyze", json={"problem": problem, "stream": True}) as r:
+        r.raise_for_status()
+        event = None
+        async for line in r.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                now = time.perf_counter() - start
+                if event == "error":
+                    raise RuntimeError(json.loads(line[5:])["detail"])
+                if event == "token":
+                    timings.setdefault("first_token", now)
+                elif event == "section":
+                    timings.setdefault("first_section", now)
+                elif event == "done":
+                    timings["total"] = now
+    return timings
+
+
+async def run(base_url: str, runs: int) -> dict:
+    results = {"blocking": [], "streaming": []}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        for i in range(runs):
+            results["blocking"].append(await blocking_run(client, f"blocking problem {i}"))
+            results["streaming"].append(await streaming_run(client, f"streaming problem {i}"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--app-port", type=int, default=9200)
+    args = parser.parse_args()
+
+    with serve(create_app(args.latency, token_delay=args.token_delay), port=args.stub_port) as stub_url:
+        os.environ["OPENROUTER_URL"] = f"{stub_url}/api/v1/chat/completions"
+        os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+        from app.main import app
+
+        with serve(app, port=args.app_port) as app_url:
+            results = asyncio.run(run(app_url, args.runs))
+
+    print(f"runs={args.runs} latency={args.latency}s token_delay={args.token_delay}s")
+    print(f"{'mode':<10} {'first token':>12} {'first section':>14} {'total':>8}")
+    for mode, rows in results.items():
+        medians = [statistics.median(r[k] for r in rows) for k in ("first_token", "first_section", "total")]
+        print(f"{mode:<10} " + " ".join(f"{m * 1000:>11.0f}ms" for m in medians))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Latency budget for the /suggest analyzer on large files.
+
+For each file size, measures the analyzer directly:
+  cold   - first analysis of a new file (every chunk parsed and walked)
+  repeat - the exact same code again (whole-result cache hit)
+  edit   - one line changed, as after a keystroke (only that chunk redone)
+and checks the median keystroke path against `--budget-ms`.
+
+    python -m benchmarks.bench_suggest --lines 1000 2500 5000 --budget-ms 50
+"""
+import argparse
+import statistics
+import time
+
+from app.analyzer import CodeAnalyzer
+
+FUNCTION = '''
+def solve_{i}(nums, target):
+    seen = []
+    out = ""
+    for a in range(len(nums)):
+        for b in range(a + 1, len(nums)):
+            if nums[b] in seen:
+                out += str(nums[b])
+        seen.append(nums[a])
+    return out
+'''
+
+
+def make_source(lines: int) -> str:
+    per_function = FUNCTION.count("\n")
+    body = "".join(FUNCTION.format(i=i) for i in range(max(1, lines // per_function)))
+    return body + "\nn = int(input())\nprint(solve_0(list(range(n)), n))\n"
+
+
+def edit(source: str, version: int) -> str:
+    # Change one statement in the middle of the file, like a keystroke would.
+    lines = source.splitlines(keepends=True)
+    middle = len(lines) // 2
+    while "return out" not in lines[middle]:
+        middle += 1
+    lines[middle] = f"    return out  # edit {version}\n"
+    return "".join(lines)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 2500, 5000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    print(f"{'lines':>6} {'cold':>9} {'repeat':>9} {'edit p50':>9} {'edit max':>9}  budget")
+    over = False
+    for lines in args.lines:
+        source = make_source(lines)
+        analyzer = CodeAnalyzer()
+        cold = timed(analyzer.analyze, source)
+        repeat = statistics.median(timed(analyzer.analyze, source) for _ in range(args.runs))
+        edits = [timed(analyzer.analyze, edit(source, v)) for v in range(args.runs)]
+        ok = statistics.median(edits) <= args.budget_ms
+        over |= not ok
+        print(f"{source.count(chr(10)):>6} {cold:>7.1f}ms {repeat:>7.3f}ms {statistics.median(edits):>7.1f}ms "
+              f"{max(edits):>7.1f}ms  {'ok' if ok else 'OVER'}")
+    if over:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Offline load test for the main endpoints across uvicorn worker counts.
+
+Starts the stub OpenRouter and the real app (`uvicorn app.main:app
+--workers N`) as subprocesses, then drives each scenario with a closed loop
+of `--concurrency` clients for `--duration` seconds after a warmup. It reports
+RPS and p50/p95/p99 latency per scenario and worker count, and writes
+everything to a JSON file. Pass an earlier file as `--baseline` to diff two
+commits; with `--max-regression` a drop in RPS or a rise in p95 beyond that
+fraction exits non-zero.
+
+Every request is deterministic (prompts are numbered, stub errors come from
+a seeded RNG), so runs on the same machine are comparable. The load
+generator shares the CPU with the server: on small machines, keep the
+concurrency modest or pin the processes to separate cores.
+
+    python -m benchmarks.loadtest --workers 1 4 --concurrency 16 --duration 10
+    python -m benchmarks.loadtest --scenarios analyze --error-rate 0.05 --baseline old.json
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+
+from benchmarks.bench_suggest import edit, make_source
+
+BACKEND = Path(__file__).resolve().parent.parent
+SUGGEST_SOURCE = make_source(300)
+
+# name -> (method, path, body for request i)
+SCENARIOS = {
+    "analyze": ("POST", "/analyze", lambda i: {"problem": f"Two sum variant #{i}: return the indices."}),
+    "chat-explain": (
+        "POST",
+        "/chat-explain",
+        lambda i: {"question": f"Why is lookup O(1)? (#{i})", "context": "hash maps"},
+    ),
+    "execute": ("POST", "/execute", lambda i: {"source": f"print(sum(range({1000 + i % 100})))"}),
+    "suggest": ("POST", "/suggest", lambda i: {"code": edit(SUGGEST_SOURCE, i)}),
+    "leaderboard": ("GET", "/leaderboard", None),
+}
+
+
+# -------------------------
+# Processes
+# -------------------------
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[:4]} exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+@contextmanager
+def _process(args: list, env: dict, ready_url: str):
+    # stdout carries uvicorn's access log; warnings and crashes still reach stderr.
+    proc = subprocess.Popen(args, cwd=BACKEND, env={**os.environ, **env}, stdout=subprocess.DEVNULL)
+    try:
+        _wait_ready(ready_url, proc)
+        yield proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def stub_server(args):
+    cmd = [
+        sys.executable, "-m", "benchmarks.stub_openrouter",
+        "--port", str(args.stub_port),
+        "--latency", str(args.latency),
+        "--token-delay", str(args.token_delay),
+        "--error-rate", str(args.error_rate),
+        "--seed", str(args.seed),
+        "--log-level", "warning",
+    ]
+    return _process(cmd, {}, f"http://127.0.0.1:{args.stub_port}/openapi.json")
+
+
+def app_server(args, workers: int, data_dir: str):
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1",
+        "--port", str(args.app_port),
+        "--workers", str(workers),
+        "--log-level", "warning",
+        "--no-access-log",
+    ]
+    env = {
+        "OPENROUTER_URL": f"http://127.0.0.1:{args.stub_port}/api/v1/chat/completions",
+        "OPENROUTER_API_KEY": "stub",
+        "LEADERBOARD_DB": os.path.join(data_dir, f"leaderboard-{workers}.db"),
+        # Injected upstream errors would otherwise log a warning per retry.
+        "LOG_LEVEL": "ERROR",
+    }
+    env.update(item.split("=", 1) for item in args.env)
+    return _process(cmd, env, f"http://127.0.0.1:{args.app_port}/list-models")
+
+
+# -------------------------
+# Load
+# -------------------------
+def percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def drive(base_url: str, scenario: str, concurrency: int, duration: float, warmup: float) -> dict:
+    method, path, body = SCENARIOS[scenario]
+    counter = itertools.count()
+    latencies, statuses = [], {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+
+        async def worker():
+            while time.perf_counter() < stop_at:
+                i = next(counter)
+                sent = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body(i) if body else None)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                done = time.perf_counter()
+                if sent >= measure_from and done <= stop_at:
+                    latencies.append(done - sent)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    latencies.sort()
+    ok = sum(n for s, n in statuses.items() if s.startswith("2") or s == "304")
+    ms = lambda pct: round(percentile(latencies, pct) * 1000, 2)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "rps": round(len(latencies) / duration, 2),
+        "p50_ms": ms(50),
+        "p95_ms": ms(95),
+        "p99_ms": ms(99),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+# -------------------------
+# Reporting
+# -------------------------
+def git_revision() -> dict:
+    def git(*cmd):
+        return subprocess.run(["git", *cmd], cwd=BACKEND, capture_output=True, text=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def print_table(results: list):
+    print(f"\n{'workers':>7} {'scenario':<13} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['scenario']:<13} {r['rps']:>9.1f} {r['p50_ms']:>7.1f}ms "
+              f"{r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['errors']:>7}")
+
+
+def compare(results: list, baseline_path: str, max_regression: float) -> bool:
+    """Print changes against a previous run; True if any exceeds max_regression."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    before = {(r["workers"], r["scenario"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')})")
+    print(f"{'workers':>7} {'scenario':<13} {'rps before -> after':>27} {'p95 before -> after':>31}")
+    regressed = False
+    for r in results:
+        old = before.get((r["workers"], r["scenario"]))
+        if old is None:
+            continue
+        rps_change = r["rps"] / old["rps"] - 1 if old["rps"] else 0.0
+        p95_change = r["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        flag = ""
+        if max_regression is not None and (rps_change < -max_regression or p95_change > max_regression):
+            regressed, flag = True, "  REGRESSION"
+        old_p95, new_p95 = f"{old['p95_ms']:.1f}ms", f"{r['p95_ms']:.1f}ms"
+        print(f"{r['workers']:>7} {r['scenario']:<13} {old['rps']:>9.1f} -> {r['rps']:<9.1f}{rps_change:>+6.0%} "
+              f"{old_p95:>11} -> {new_p95:<11}{p95_change:>+6.0%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="uvicorn worker counts to compare")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub replies that are 500s")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the app, e.g. LLM_MAX_CONCURRENCY=32")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--app-port", type=int, default=9200)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/loadtest-<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="e.g. 0.2 fails on a 20%% regression")
+    args = parser.parse_args()
+
+    meta = {
+        **git_revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir, stub_server(args):
+        for workers in args.workers:
+            with app_server(args, workers, data_dir):
+                base_url = f"http://127.0.0.1:{args.app_port}"
+                for scenario in args.scenarios:
+                    result = asyncio.run(drive(base_url, scenario, args.concurrency, args.duration, args.warmup))
+                    results.append({"workers": workers, **result})
+                    print(f"workers={workers} {scenario}: {result['rps']:.1f} rps, p95 {result['p95_ms']:.1f}ms")
+
+    print_table(results)
+    output = Path(args.output or BACKEND / "benchmarks" / "results" / f"loadtest-{meta['commit'] or 'local'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": meta, "results": results}, indent=2, sort_keys=True) + "\n")
+    print(f"\nwrote {output}")
+
+    if args.baseline and compare(results, args.baseline, args.max_regression):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
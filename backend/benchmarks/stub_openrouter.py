@@ -0,0 +1,141 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Lets benchmarks and tests exercise the real HTTP path of the backend without
+network access or an API key. Latency is simulated with asyncio.sleep so the
+stub itself never becomes the bottleneck: `latency` is the delay before the
+first token and `token_delay` the generation time per token. Requests with
+`stream: true` get OpenRouter-style SSE chunks; others wait for the whole
+completion.
+
+Faults can be injected to exercise the backend's failover: `error_rate`
+answers that fraction of requests with a 500, `failing_models` always get a
+503, and `model_latency` adds extra delay for specific models.
+
+    python -m benchmarks.stub_openrouter --port 9100 --latency 0.5
+    python -m benchmarks.stub_openrouter --error-rate 0.2 --fail-model a --slow-model b=3
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_REPLY = """Math Explanation:
+Scan the array once while keeping a hash map of seen values.
+Time: O(n), Space: O(n).
+
+Pseudocode:
+FUNCTION solve(nums, target)
+    seen <- empty map
+    FOR i FROM 0 TO length(nums) - 1
+        IF target - nums[i] IN seen
+            RETURN (seen[target - nums[i]], i)
+        seen[nums[i]] <- i
+    RETURN NONE
+"""
+
+
+def create_app(
+    latency: float = 0.0,
+    reply: str = STUB_REPLY,
+    token_delay: float = 0.0,
+    error_rate: float = 0.0,
+    failing_models=(),
+    model_latency: dict = None,
+    seed: int = None,
+) -> FastAPI:
+    stub = FastAPI()
+    stub.state.latency = latency
+    stub.state.token_delay = token_delay
+    stub.state.error_rate = error_rate
+    stub.state.failing_models = set(failing_models)
+    stub.state.model_latency = dict(model_latency or {})
+    stub.state.calls = 0
+    stub.state.calls_by_model = {}
+    stub.state.errors = 0
+    rng = random.Random(seed)
+    tokens = re.findall(r"\S+\s*|\s+", reply)
+
+    async def stream_tokens(model):
+        for token in tokens:
+            if stub.state.token_delay:
+                await asyncio.sleep(stub.state.token_delay)
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": token}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @stub.post("/api/v1/chat/completions")
+    async def chat_completions(body: dict):
+        model = body.get("model")
+        stub.state.calls += 1
+        stub.state.calls_by_model[model] = stub.state.calls_by_model.get(model, 0) + 1
+        delay = stub.state.latency + stub.state.model_latency.get(model, 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if model in stub.state.failing_models:
+            stub.state.errors += 1
+            return JSONResponse({"error": {"message": f"{model} is unavailable"}}, status_code=503)
+        if stub.state.error_rate and rng.random() < stub.state.error_rate:
+            stub.state.errors += 1
+            return JSONResponse({"error": {"message": "Injected upstream error"}}, status_code=500)
+        if body.get("stream"):
+            return StreamingResponse(stream_tokens(model), media_type="text/event-stream")
+        if stub.state.token_delay:
+            await asyncio.sleep(stub.state.token_delay * len(tokens))
+        return {
+            "id": "stub",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}}],
+            "usage": {"completion_tokens": len(tokens)},
+        }
+
+    return stub
+
+
+@contextmanager
+def serve(app, host: str = "127.0.0.1", port: int = 9100):
+    """Run an ASGI app with uvicorn on a background thread for the duration of the block."""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on {host}:{port} failed to start")
+        time.sleep(0.01)
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fail-model", action="append", default=[], help="Model that always returns 503")
+    parser.add_argument("--slow-model", action="append", default=[], help="MODEL=SECONDS of extra latency")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    slow = {model: float(seconds) for model, seconds in (item.rsplit("=", 1) for item in args.slow_model)}
+    stub = create_app(
+        args.latency,
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        failing_models=args.fail_model,
+        model_latency=slow,
+        seed=args.seed,
+    )
+    uvicorn.run(stub, host=args.host, port=args.port, log_level=args.log_level)
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep the app's file-backed stores out of the working tree during tests.
+os.environ.setdefault("LEADERBOARD_DB", os.path.join(tempfile.mkdtemp(), "leaderboard.db"))
@@ -0,0 +1,145 @@
+import ast
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.analyzer import CodeAnalyzer, Rule, RULES
+from app.main import app
+
+
+def _rules(code: str) -> list:
+    return [(issue["rule"], issue["line"]) for issue in CodeAnalyzer().analyze(code)["issues"]]
+
+
+def test_keywords_inside_strings_are_not_flagged():
+    assert _rules('print("for each try, input something")\n') == []
+
+
+def test_each_rule_fires_on_its_pattern():
+    code = (
+        "seen = []\n"
+        "def f(items):\n"
+        "    out = ''\n"
+        "    doubled = []\n"
+        "    for a in items:\n"
+        "        for b in items:\n"
+        "            if b in seen:\n"
+        "                out += str(b)\n"
+        "    for x in items:\n"
+        "        doubled.append(x)\n"
+        "    return out\n"
+        "n = int(input())\n"
+    )
+    assert _rules(code) == [
+        ("nested-loops", 5),
+        ("quadratic-membership", 7),
+        ("string-concat-in-loop", 8),
+        ("append-in-loop", 9),
+        ("missing-input-validation", 12),
+    ]
+
+
+def test_sets_and_guarded_input_are_fine():
+    code = (
+        "seen = set()\n"
+        "for x in range(3):\n"
+        "    if x in seen:\n"
+        "        pass\n"
+        "try:\n"
+        "    n = int(input())\n"
+        "except ValueError:\n"
+        "    n = 0\n"
+    )
+    assert _rules(code) == []
+
+
+def test_loop_that_reads_its_own_list_is_not_a_comprehension():
+    code = (
+        "seen = []\n"
+        "for x in data:\n"
+        "    if x not in seen:\n"
+        "        seen.append(x)\n"
+        "totals = [0]\n"
+        "for x in data:\n"
+        "    totals.append(totals[-1] + x)\n"
+    )
+    assert _rules(code) == [("quadratic-membership", 3)]
+
+
+def test_only_edited_chunk_is_reanalyzed():
+    functions = [f"def f{i}(xs):\n    for a in xs:\n        for b in xs:\n            pass\n" for i in range(10)]
+    analyzer = CodeAnalyzer()
+    analyzer.analyze("".join(functions))
+    misses = analyzer.chunk_misses
+
+    functions[4] = functions[4].replace("pass", "print(a, b)")
+    result = analyzer.analyze("".join(functions))
+    assert analyzer.chunk_misses == misses + 1
+    assert [i["line"] for i in result["issues"]] == [2 + 4 * i for i in range(10)]
+
+    assert analyzer.cached("".join(functions)) is result
+
+
+def test_def_inside_string_falls_back_to_whole_file():
+    code = 'doc = """\ndef not_code():\n"""\nfor a in range(2):\n    for b in range(2):\n        pass\n'
+    assert _rules(code) == [("nested-loops", 4)]
+
+
+def test_syntax_error_is_reported_as_a_suggestion():
+    result = CodeAnalyzer().analyze("for x in\n")
+    assert result["issues"][0]["rule"] == "syntax"
+    assert result["suggestions"][0].startswith("Line 1: Syntax error")
+
+
+def test_custom_rules_plug_in():
+    class NoPrint(Rule):
+        name = "no-print"
+        nodes = (ast.Call,)
+
+        def check(self, node, ctx):
+            if getattr(node.func, "id", None) == "print":
+                yield node.lineno, "Use logging instead of print."
+
+    result = CodeAnalyzer(rules=RULES + [NoPrint]).analyze("print(1)\n")
+    assert result["suggestions"] == ["Line 1: Use logging instead of print."]
+
+
+def test_suggest_endpoint_shape():
+    client = TestClient(app)
+    body = client.post("/suggest", json={"code": "x = input()\n"}).json()
+    assert body["suggestions"] and body["issues"][0]["rule"] == "missing-input-validation"
+
+
+def test_concurrent_analysis_never_overlaps_parses(monkeypatch):
+    real_parse, active, peak = ast.parse, [0], [0]
+
+    def tracking_parse(*args, **kwargs):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(0.001)
+        try:
+            return real_parse(*args, **kwargs)
+        finally:
+            active[0] -= 1
+
+    monkeypatch.setattr(ast, "parse", tracking_parse)
+    analyzer = CodeAnalyzer()
+    sources = [f"def f{i}(xs):\n    for a in xs:\n        for b in xs:\n            pass\n" for i in range(40)]
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(analyzer.analyze(s))) for s in sources]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert peak[0] == 1
+    assert len(results) == 40 and all(r["issues"][0]["rule"] == "nested-loops" for r in results)
+
+
+def test_code_too_complex_to_parse_is_reported_not_raised():
+    analyzer = CodeAnalyzer()
+    for code in ("x = " + "+".join(["1"] * 100000) + "\n", "x = " + "-" * 200000 + "1\n"):
+        result = analyzer.analyze(code)
+        assert result["issues"][0]["rule"] == "too-complex"
+        assert result["suggestions"][0].startswith("Line 1: Code")
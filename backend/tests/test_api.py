@@ -19,4 +19,8 @@ async def test_execute_endpoint():
         "stdin": ""
     })
     assert response.status_code == 200
-    assert response.json()["output"] == "Hello\n"
\ No newline at end of file
+    assert response.json()["output"] == "Hello\n"
+
+def test_execute_rejects_non_string_stdin():
+    response = client.post("/execute", json={"source": "print(1)", "stdin": 5})
+    assert response.status_code == 400
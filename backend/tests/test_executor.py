@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.executor import ExecutionLimits, ExecutorBusy, ProcessPoolEngine
+
+FAST_LIMITS = ExecutionLimits(cpu_seconds=1, wall_seconds=2, output_bytes=1024)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_jobs_keep_their_own_stdin_and_stdout():
+    async with ProcessPoolEngine(workers=2, limits=FAST_LIMITS) as engine:
+        results = await asyncio.gather(*(
+            engine.run("print(input() * 2)", f"{i}\n") for i in range(6)
+        ))
+    assert [r["output"] for r in results] == [f"{i}{i}\n" for i in range(6)]
+    assert all(r["status"] == "ok" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_infinite_loop_is_stopped_and_pool_keeps_working():
+    async with ProcessPoolEngine(workers=1, limits=FAST_LIMITS) as engine:
+        looped = await engine.run("while True:\n    pass")
+        after = await engine.run("print('still alive')")
+    assert looped["status"] == "timeout"
+    assert after["output"] == "still alive\n"
+
+
+@pytest.mark.asyncio
+async def test_output_and_errors_are_bounded_and_reported():
+    async with ProcessPoolEngine(workers=1, limits=FAST_LIMITS) as engine:
+        flood = await engine.run("while True:\n    print('x' * 100)")
+        crash = await engine.run("print('before')\n1 / 0")
+    assert flood["status"] == "output_limit"
+    assert len(flood["output"]) <= FAST_LIMITS.output_bytes
+    assert crash["output"] == "before\n"
+    assert "ZeroDivisionError" in crash["error"]
+
+
+@pytest.mark.asyncio
+async def test_bad_stdin_is_a_job_error_not_a_dead_worker():
+    async with ProcessPoolEngine(workers=1, limits=FAST_LIMITS) as engine:
+        bad = await engine.run("print(1)", 5)
+        after = await engine.run("print(input())", "ok")
+        assert engine.stats()["killed"] == 0
+    assert bad["status"] == "error" and "TypeError" in bad["error"]
+    assert after["output"] == "ok\n"
+
+
+@pytest.mark.asyncio
+async def test_jobs_cannot_change_the_interpreter_for_later_jobs():
+    async with ProcessPoolEngine(workers=1, limits=FAST_LIMITS) as engine:
+        await engine.run("import builtins; builtins.input = lambda *a: 'hijacked'")
+        read = await engine.run("print(input())", "7\n")
+        await engine.run("import sys; sys.setrecursionlimit(10 ** 6)")
+        recursed = await engine.run("def f(n):\n    return f(n + 1)\nf(0)")
+    assert read["output"] == "7\n"
+    assert "RecursionError" in recursed["error"]
+
+
+@pytest.mark.asyncio
+async def test_workers_are_recycled_after_max_jobs():
+    async with ProcessPoolEngine(workers=1, max_jobs_per_worker=2, limits=FAST_LIMITS) as engine:
+        for _ in range(3):
+            await engine.run("import os; print(os.getpid())")
+        assert engine.stats()["recycled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_is_per_job_after_a_heavy_job():
+    async with ProcessPoolEngine(workers=1) as engine:
+        heavy = await engine.run("b = bytearray(150 * 1024 * 1024)\nprint(len(b))")
+        light = await engine.run("print(2)")
+    assert heavy["memory_kb"] > 150 * 1024
+    assert light["memory_kb"] < heavy["memory_kb"] - 100 * 1024
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_instead_of_waiting():
+    async with ProcessPoolEngine(workers=1, queue_size=1, limits=FAST_LIMITS) as engine:
+        slow = "import time; time.sleep(0.5)"
+        running = asyncio.ensure_future(engine.run(slow))
+        await asyncio.sleep(0.1)
+        queued = asyncio.ensure_future(engine.run(slow))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorBusy):
+            await engine.run(slow)
+        await asyncio.gather(running, queued)
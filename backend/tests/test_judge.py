@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.executor import ProcessPoolEngine
+from app.judge import judge_batch, verdict_for
+from app.main import app
+
+DOUBLE = "n = int(input())\nprint(n * 2)"
+
+
+def _result(output="", error="", status="ok"):
+    return {"output": output, "error": error, "status": status}
+
+
+def test_verdicts():
+    assert verdict_for(_result("4\n"), "4") == "pass"
+    assert verdict_for(_result("4  \n\n"), "4\n") == "pass"
+    assert verdict_for(_result("5\n"), "4") == "fail"
+    assert verdict_for(_result(status="timeout", error="Time limit exceeded"), "4") == "timeout"
+    assert verdict_for(_result(error="Execution Error: ValueError"), "4") == "error"
+    assert verdict_for(_result("anything"), None) == "pass"
+
+
+def test_batch_judges_every_case():
+    with TestClient(app) as client:
+        response = client.post("/execute/batch", json={
+            "source": DOUBLE,
+            "cases": [
+                {"stdin": "1\n", "expected": "2"},
+                {"stdin": "2\n", "expected": "5"},
+                {"stdin": "x\n", "expected": "0"},
+            ],
+        })
+    body = response.json()
+    assert response.status_code == 200
+    assert [c["verdict"] for c in body["cases"]] == ["pass", "fail", "error"]
+    assert (body["passed"], body["failed"], body["stopped_early"]) == (1, 2, False)
+
+
+def test_batch_reports_compile_error_once():
+    with TestClient(app) as client:
+        body = client.post("/execute/batch", json={
+            "source": "def (", "cases": [{"stdin": "", "expected": ""}],
+        }).json()
+    assert body["cases"] == []
+    assert body["compile_error"].startswith("SyntaxError")
+
+
+def test_batch_stream_stops_on_first_failure():
+    cases = [{"stdin": "1\n", "expected": "0"}] + [{"stdin": f"{i}\n", "expected": str(i * 2)} for i in range(20)]
+    with TestClient(app) as client:
+        response = client.post("/execute/batch", json={
+            "source": DOUBLE, "cases": cases, "stop_on_failure": True, "stream": True,
+        })
+    events = [
+        (frame.split("\n")[0][7:], json.loads(frame.split("\n")[1][6:]))
+        for frame in response.text.strip().split("\n\n")
+    ]
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert events[-1][0] == "done"
+    assert events[-1][1]["stopped_early"] is True
+    assert any(data["verdict"] == "fail" for event, data in events if event == "case")
+    assert events[-1][1]["completed"] < len(cases)
+
+
+@pytest.mark.asyncio
+async def test_case_memory_is_not_inherited_from_a_heavy_case():
+    source = "b = bytearray(int(input()) * 1024 * 1024)\nprint(len(b) > -1)"
+    cases = [{"stdin": "150\n", "expected": "True"}, {"stdin": "0\n", "expected": "True"}]
+    async with ProcessPoolEngine(workers=1) as engine:
+        results = {c["index"]: c async for c in judge_batch(engine, source, cases)}
+    assert results[0]["memory_kb"] > 150 * 1024
+    assert results[1]["memory_kb"] < results[0]["memory_kb"] - 100 * 1024
+
+
+def test_batch_rejects_missing_cases():
+    with TestClient(app) as client:
+        assert client.post("/execute/batch", json={"source": DOUBLE}).status_code == 400
+
+
+def test_batch_rejects_non_string_case_fields():
+    with TestClient(app) as client:
+        for case in ({"stdin": "2", "expected": 4}, {"stdin": 2, "expected": "4"}):
+            response = client.post("/execute/batch", json={"source": DOUBLE, "cases": [case]})
+            assert response.status_code == 400
+        # expected may be left out or null: the case passes on any clean run.
+        response = client.post("/execute/batch", json={"source": DOUBLE, "cases": [{"stdin": "2", "expected": None}]})
+        assert response.json()["passed"] == 1
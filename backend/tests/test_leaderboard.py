@@ -0,0 +1,147 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.leaderboard import LeaderboardStore, TopSnapshot
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "leaderboard.db")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_are_folded_into_one_batch(db_path):
+    async with LeaderboardStore(db_path, flush_interval=0.05) as store:
+        scores = await asyncio.gather(*(store.add_score("ada", 5) for _ in range(10)))
+        assert scores == [50] * 10
+        assert store.stats()["batches"] == 1
+        assert (await store.rank_of("ada"))["score"] == 50
+
+
+@pytest.mark.asyncio
+async def test_ranks_and_pagination(db_path):
+    async with LeaderboardStore(db_path, seed_users=()) as store:
+        for name, points in [("a", 30), ("b", 20), ("c", 20), ("d", 10)]:
+            await store.add_score(name, points)
+
+        assert [(e["rank"], e["name"]) for e in await store.top(2)] == [(1, "a"), (2, "b")]
+        assert [(e["rank"], e["name"]) for e in await store.top(2, offset=2)] == [(2, "c"), (4, "d")]
+        assert (await store.rank_of("c"))["rank"] == 2
+        assert await store.rank_of("nobody") is None
+        assert await store.count() == 4
+
+
+@pytest.mark.asyncio
+async def test_bad_row_only_fails_its_own_write(db_path):
+    async with LeaderboardStore(db_path, flush_interval=0.05) as store:
+        ok, bad = await asyncio.gather(
+            store.add_score("alice", 5), store.add_score("mallory", 10 ** 20), return_exceptions=True
+        )
+        assert ok == 5
+        assert isinstance(bad, OverflowError)
+        assert await store.rank_of("mallory") is None
+
+        await store.add_score("big", 2 ** 62)
+        assert await store.add_score("big", 2 ** 62) == 2 ** 62  # clamped, not turned into a float
+
+
+@pytest.mark.asyncio
+async def test_flusher_survives_database_errors(db_path):
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    async with LeaderboardStore(db_path, flush_interval=0.01) as store:
+        store._snapshot_rows = locked
+        await asyncio.sleep(0.05)
+        assert store.started
+        del store._snapshot_rows
+
+        store._apply_each = store._apply_batch = locked
+        with pytest.raises(sqlite3.OperationalError):
+            await asyncio.wait_for(store.add_score("ada", 1), 1)
+        del store._apply_each, store._apply_batch
+        assert await asyncio.wait_for(store.add_score("ada", 2), 1) == 2
+
+        # A flusher that died anyway is restarted by the next write.
+        store._flusher.cancel()
+        await asyncio.gather(store._flusher, return_exceptions=True)
+        assert await asyncio.wait_for(store.add_score("ada", 3), 1) == 5
+
+
+@pytest.mark.asyncio
+async def test_scores_survive_reopen(db_path):
+    async with LeaderboardStore(db_path) as store:
+        await store.add_score("grace", 7)
+    async with LeaderboardStore(db_path) as store:
+        assert (await store.rank_of("grace"))["score"] == 7
+
+
+def test_score_and_leaderboard_endpoints(db_path, monkeypatch):
+    monkeypatch.setattr(main, "leaderboard", LeaderboardStore(db_path))
+    with TestClient(main.app) as client:
+        assert client.post("/score", json={"name": "linus", "points": 10}).json() == {"name": "linus", "score": 10}
+        assert client.post("/score", json={"name": "linus", "points": "x"}).status_code == 400
+        assert client.post("/score", json={"name": "linus", "points": 10 ** 20}).status_code == 400
+
+        board = client.get("/leaderboard").json()
+        assert board[0] == {"rank": 1, "name": "linus", "score": 10}
+        assert client.get("/leaderboard/user").json()["rank"] == 2
+        assert client.get("/leaderboard/ghost").status_code == 404
+        assert client.get("/leaderboard", params={"limit": 0}).status_code == 422
+
+
+def test_snapshot_only_changes_when_top_n_moves():
+    snapshot = TopSnapshot(size=2)
+    snapshot.load([("a", 30, 1), ("b", 20, 2)])
+    version = snapshot.version
+
+    assert snapshot.apply({"c": (10, 3)})
+    assert snapshot.version == version
+
+    assert snapshot.apply({"c": (25, 3)})
+    assert [row["name"] for row in json.loads(snapshot.page(2)[0])] == ["a", "c"]
+
+    # A top user dropping could let an unseen user in: caller must reload.
+    assert not snapshot.apply({"a": (5, 1)})
+
+
+def test_snapshot_admits_several_new_entrants_from_one_batch():
+    snapshot = TopSnapshot(size=3)
+    snapshot.load([("a", 30, 1), ("b", 20, 2), ("e", 10, 3)])
+
+    assert snapshot.apply({"c": (100, 4), "d": (25, 5)})
+    assert [row["name"] for row in json.loads(snapshot.page(3)[0])] == ["c", "a", "d"]
+
+    # An in-place rise of the Nth row doesn't raise the bar for newcomers.
+    snapshot.load([("a", 30, 1), ("b", 20, 2), ("e", 10, 3)])
+    assert snapshot.apply({"e": (50, 3), "d": (25, 5)})
+    assert [row["name"] for row in json.loads(snapshot.page(3)[0])] == ["e", "a", "d"]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_follows_writes_from_other_connections(db_path):
+    async with LeaderboardStore(db_path, snapshot_size=3, flush_interval=0.01) as store:
+        async with LeaderboardStore(db_path, snapshot_size=3) as other:
+            await other.add_score("remote", 1000)
+        await asyncio.sleep(0.1)
+        body, _ = await store.top_page(1)
+        assert json.loads(body)[0]["name"] == "remote"
+
+
+def test_leaderboard_etag_and_not_modified(db_path, monkeypatch):
+    monkeypatch.setattr(main, "leaderboard", LeaderboardStore(db_path))
+    with TestClient(main.app) as client:
+        first = client.get("/leaderboard")
+        etag = first.headers["etag"]
+        assert client.get("/leaderboard", headers={"If-None-Match": etag}).status_code == 304
+
+        client.post("/score", json={"name": "new-leader", "points": 99})
+        changed = client.get("/leaderboard", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()[0]["name"] == "new-leader"
+        assert changed.headers["etag"] != etag
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app.llm_cache import ResponseCache, cache_key
+
+
+def test_cache_key_ignores_whitespace_but_not_params():
+    base = cache_key("two  sum\n", "m", 800, 0.6)
+    assert base == cache_key(" two sum", "m", 800, 0.6)
+    assert base != cache_key("two sum", "m", 400, 0.6)
+    assert base != cache_key("two sum", "other", 800, 0.6)
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    await cache.set("a", "A")
+    await cache.set("b", "B")
+    assert await cache.get("a") == "A"
+    await cache.set("c", "C")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=0.01)
+    await cache.set("a", "A")
+    await asyncio.sleep(0.02)
+    assert await cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_computation():
+    cache = ResponseCache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+    assert results == ["answer"] * 5
+    assert calls == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_computation_is_not_cached():
+    cache = ResponseCache()
+
+    async def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("k", boom)
+    assert await cache.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    first = ResponseCache(disk_path=path)
+    await first.set("k", "persisted")
+    first.close()
+
+    second = ResponseCache(disk_path=path)
+    assert await second.get("k") == "persisted"
+    assert second.stats()["disk_hits"] == 1
+    second.close()
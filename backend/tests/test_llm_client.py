@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.llm_client import LLMClient
+
+
+def _slow_transport(state):
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.05)
+        state["active"] -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_requests_overlap_up_to_concurrency_limit():
+    state = {"active": 0, "peak": 0}
+    async with LLMClient("http://stub/chat", max_concurrency=3, transport=_slow_transport(state)) as llm:
+        responses = await asyncio.gather(*(llm.post({}, {}) for _ in range(8)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert state["peak"] == 3
+
+
+@pytest.mark.asyncio
+async def test_client_reopens_lazily_after_close():
+    state = {"active": 0, "peak": 0}
+    llm = LLMClient("http://stub/chat", transport=_slow_transport(state))
+    await llm.aclose()
+    response = await llm.post({}, {})
+    assert response.json()["choices"][0]["message"]["content"] == "ok"
+    await llm.aclose()
+    assert not llm.started
@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.llm_client import LLMClient, UpstreamError
+from app.llm_router import CircuitBreaker, ModelRouter, RouterError, StreamInterrupted
+from benchmarks.stub_openrouter import create_app
+
+
+def _payload(model):
+    return {"model": model, "messages": [{"role": "user", "content": "hi"}]}
+
+
+def _router(stub, models=("a", "b"), **kwargs):
+    client = LLMClient("http://stub/api/v1/chat/completions", transport=httpx.ASGITransport(app=stub))
+    kwargs.setdefault("backoff_base", 0.001)
+    kwargs.setdefault("hedge_percentile", 0)
+    return ModelRouter(client, list(models), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_fails_over_and_opens_breaker():
+    stub = create_app(failing_models={"a"})
+    router = _router(stub, breaker_threshold=2, breaker_cooldown=60)
+
+    for _ in range(3):
+        assert (await router.complete(_payload, {})).startswith("Math Explanation")
+
+    assert stub.state.calls_by_model == {"a": 2, "b": 3}
+    state = {m["model"]: m for m in router.state()["models"]}
+    assert state["a"]["state"] == "open" and not state["a"]["available"]
+    assert state["b"]["state"] == "closed"
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_to_backup():
+    stub = create_app(model_latency={"a": 2.0})
+    router = _router(stub, hedge_percentile=95, hedge_initial_delay=0.05)
+
+    start = time.monotonic()
+    await router.complete(_payload, {})
+    assert time.monotonic() - start < 1.0
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+    # The cancelled primary is neither a success nor a failure, and stays usable.
+    assert router.breakers["a"].failures == 0
+    assert router.available() == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_single_model_is_never_hedged_to_itself():
+    stub = create_app(latency=0.3)
+    router = _router(stub, models=["only"], hedge_percentile=95, hedge_initial_delay=0.05)
+
+    await router.complete(_payload, {})
+    assert stub.state.calls_by_model == {"only": 1}
+    assert router.hedges == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_trial_releases_the_breaker():
+    stub = create_app(latency=1.0)
+    router = _router(stub, models=["a"], breaker_threshold=1, breaker_cooldown=0.05, deadline=0.2)
+    with pytest.raises(RouterError):
+        await router.complete(_payload, {})
+    assert router.breakers["a"].state == "open"
+
+    # After the cooldown the next call is the half-open trial; it's cancelled
+    # from outside, like a client disconnect.
+    await asyncio.sleep(0.06)
+    call = asyncio.ensure_future(router.complete(_payload, {}))
+    await asyncio.sleep(0.05)
+    assert router.breakers["a"].state == "half_open" and router.available() == []
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    assert router.available() == ["a"]
+
+    # A trial that runs into the deadline counts as a failure, not a stuck trial.
+    with pytest.raises(RouterError):
+        await router.complete(_payload, {})
+    assert router.breakers["a"].state == "open"
+
+    stub.state.latency = 0.0
+    await asyncio.sleep(0.06)
+    assert (await router.complete(_payload, {})).startswith("Math Explanation")
+    assert router.breakers["a"].state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_total_time():
+    stub = create_app(latency=1.0)
+    router = _router(stub, deadline=0.2)
+
+    start = time.monotonic()
+    with pytest.raises(RouterError):
+        await router.complete(_payload, {})
+    assert time.monotonic() - start < 0.5
+
+    start = time.monotonic()
+    with pytest.raises(RouterError):
+        [d async for d in router.stream(_payload, {})]
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.asyncio
+async def test_stream_fails_over_until_text_is_sent():
+    stub = create_app(failing_models={"a"})
+    router = _router(stub, breaker_threshold=1, breaker_cooldown=60)
+
+    text = "".join([d async for d in router.stream(_payload, {})])
+    assert text.startswith("Math Explanation")
+    assert stub.state.calls_by_model == {"a": 1, "b": 1}
+    assert router.breakers["a"].state == "open"
+
+
+@pytest.mark.asyncio
+async def test_closing_a_stream_releases_a_half_open_trial():
+    stub = create_app()
+    router = _router(stub, models=["a"], breaker_threshold=1, breaker_cooldown=0)
+    router.on_failure("a")
+
+    deltas = router.stream(_payload, {})
+    await deltas.__anext__()
+    assert router.breakers["a"].state == "half_open" and router.available() == []
+    await deltas.aclose()  # the client disconnected
+    assert router.available() == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_stream_failure_after_text_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        body = 'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\ndata: {broken\n\n'
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    client = LLMClient("http://stub/chat", transport=httpx.MockTransport(handler))
+    router = ModelRouter(client, ["a", "b"], backoff_base=0.001, hedge_percentile=0)
+    deltas = []
+    with pytest.raises(StreamInterrupted):
+        async for delta in router.stream(_payload, {}):
+            deltas.append(delta)
+    assert deltas == ["Hi"] and len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_auth_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(401, json={"error": "bad key"})
+
+    client = LLMClient("http://stub/chat", transport=httpx.MockTransport(handler))
+    router = ModelRouter(client, ["a", "b"], backoff_base=0.001, hedge_percentile=0, breaker_threshold=2)
+    for _ in range(3):
+        with pytest.raises(UpstreamError):
+            await router.complete(_payload, {})
+        with pytest.raises(UpstreamError):
+            [d async for d in router.stream(_payload, {})]
+    assert len(calls) == 6
+    # A rejected key says nothing about the models, so no breaker opens.
+    assert router.available() == ["a", "b"]
+
+
+def test_breaker_half_opens_after_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    breaker.on_failure(now=0)
+    assert not breaker.available(now=5)
+
+    assert breaker.available(now=10)
+    breaker.on_start(now=10)
+    assert breaker.state == "half_open"
+    assert not breaker.available(now=10)  # only one trial at a time
+
+    breaker.on_failure(now=11)
+    assert breaker.state == "open" and not breaker.available(now=20)
+    breaker.on_start(now=21)
+    breaker.on_cancel()
+    assert breaker.state == "half_open" and breaker.available(now=21)
+
+    breaker.on_start(now=21)
+    breaker.on_success()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_random_errors_are_absorbed_by_retries():
+    stub = create_app(error_rate=0.3, seed=7)
+    router = _router(stub, max_attempts=6, breaker_threshold=100)
+    results = await asyncio.gather(*(router.complete(_payload, {}) for _ in range(20)))
+    assert len(results) == 20
+    assert stub.state.errors > 0
@@ -0,0 +1,81 @@
+import contextvars
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.logs import JsonFormatter
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = []
+    hist = metrics.Histogram("demo_seconds", "Demo", ["op"], buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.labels("read").observe(value)
+
+    text = metrics.render(registry)
+    assert 'demo_seconds_bucket{op="read",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{op="read",le="1"} 3' in text
+    assert 'demo_seconds_bucket{op="read",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{op="read"} 4' in text
+
+
+def test_middleware_records_route_templates_and_server_timing():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=True)
+    hist = metrics.Histogram("demo_step_seconds", "Demo", ["step"], registry=[])
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with metrics.timed(hist.labels("lookup"), "lookup"):
+            return {"id": item_id}
+
+    client = TestClient(app)
+    response = client.get("/items/42")
+    assert response.headers["server-timing"].startswith("lookup;dur=")
+    client.get("/items/43")
+
+    child = metrics.HTTP_DURATION.labels("GET", "/items/{item_id}", 200)
+    assert child.count >= 2
+    assert metrics.HTTP_IN_FLIGHT.labels("/items/{item_id}").value == 0
+    assert hist.labels("lookup").count == 2
+
+
+def test_timings_are_dropped_after_the_request_ends():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=True)
+    captured = {}
+
+    @app.get("/")
+    async def root():
+        # What a background task started by this request would inherit.
+        captured["ctx"] = contextvars.copy_context()
+        return {}
+
+    TestClient(app).get("/")
+    ctx = captured["ctx"]
+    ctx.run(metrics.add_timing, "late", 1.0)
+    assert ctx[metrics._timings].entries == []
+
+    metrics.add_timing("orphan", 1.0)  # no request context at all
+    assert metrics._timings.get() is None
+
+
+def test_metrics_endpoint_is_prometheus_text():
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/list-models")
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'route="/list-models"' in response.text
+
+
+def test_json_log_lines_carry_extra_fields():
+    record = logging.makeLogRecord({"name": "app.test", "levelname": "INFO", "msg": "llm_request"})
+    record.model = "m"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["event"] == "llm_request" and entry["model"] == "m"
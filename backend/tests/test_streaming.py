@@ -0,0 +1,75 @@
+import json
+
+import httpx
+import pytest
+
+from app.llm_client import LLMClient, UpstreamError
+from app.streaming import ANALYZE_SECTIONS, SectionParser, sse
+
+REPLY = "Math Explanation:\nUse a hash map. O(n).\n\nPseudocode:\nFUNCTION f()\n    RETURN 1\n"
+
+
+def _feed_all(chunks):
+    parser = SectionParser(ANALYZE_SECTIONS)
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return events
+
+
+def test_sections_match_blocking_parse_for_any_chunking():
+    for size in (1, 3, 7, len(REPLY)):
+        chunks = [REPLY[i:i + size] for i in range(0, len(REPLY), size)]
+        sections = {e["section"]: e["content"] for e in _feed_all(chunks) if e["event"] == "section"}
+        assert sections == {
+            "mathExplanation": "Use a hash map. O(n).",
+            "pseudoCode": "FUNCTION f()\n    RETURN 1",
+        }
+
+
+def test_marker_split_across_chunks_is_not_leaked_as_text():
+    events = _feed_all(["Math Expl", "anation: a ", "Pseudo", "code: b"])
+    tokens = "".join(e["text"] for e in events if e["event"] == "token")
+    assert tokens == " a  b"
+
+
+def test_math_section_is_emitted_before_stream_ends():
+    parser = SectionParser(ANALYZE_SECTIONS)
+    parser.feed("Math Explanation: linear ")
+    events = parser.feed("Pseudocode:")
+    assert {"event": "section", "section": "mathExplanation", "content": "linear"} in events
+
+
+def test_sse_frame_format():
+    assert sse("token", {"text": "hi"}) == 'event: token\ndata: {"text": "hi"}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_client_stream_yields_deltas_and_skips_comments():
+    body = "".join([
+        ": OPENROUTER PROCESSING\n\n",
+        "data: " + json.dumps({"choices": [{"delta": {"content": "Hel"}}]}) + "\n\n",
+        "data: " + json.dumps({"choices": [{"delta": {"content": "lo"}}]}) + "\n\n",
+        "data: [DONE]\n\n",
+    ])
+    seen = {}
+
+    def handler(request):
+        seen["payload"] = json.loads(request.content)
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    async with LLMClient("http://stub/chat", transport=httpx.MockTransport(handler)) as llm:
+        deltas = [d async for d in llm.stream({"model": "m"}, {})]
+
+    assert deltas == ["Hel", "lo"]
+    assert seen["payload"]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_client_stream_raises_on_upstream_error():
+    transport = httpx.MockTransport(lambda request: httpx.Response(429, text="rate limited"))
+    async with LLMClient("http://stub/chat", transport=transport) as llm:
+        with pytest.raises(UpstreamError) as exc:
+            [d async for d in llm.stream({}, {})]
+    assert exc.value.status_code == 429